@@ -1,4 +1,5 @@
 import pygame, sys, os, random, copy, itertools, time
+import numpy as np
 from pygame.locals import *
 
 global NUM_OF_GEMS, NUM_OF_ROWS, NUM_OF_COLUMNS, SPACE_SIZE, HIGHLIGHT_COLOR, EMPTY_SPACE, STARTING_Y , FALL_SPEED, MOVE_SPEED, SCREEN_SIZE, BG_COLOR, GRID_COLOR
@@ -22,6 +23,195 @@ FOUR_IN_A_ROW = 200
 FIVE_IN_A_ROW = 250
 BONUS = 500
 
+#One match found on the board: where it starts, how many gems long it is, which way it runs and the gem type
+RUN_DTYPE = np.dtype([("row", np.int8), ("column", np.int8), ("length", np.int8), ("vertical", np.bool_), ("gem", np.int8)])
+
+NO_RUNS = np.empty(0, dtype=RUN_DTYPE)
+
+#findRuns packs the board into one integer, byte r*NUM_OF_COLUMNS+c holding the gem at (r, c), and compares
+#whole boards at once by shifting it a byte (one column) or a row. These are the byte masks it needs
+BOARD_BYTES = NUM_OF_ROWS * NUM_OF_COLUMNS
+ROW_SHIFT = 8 * NUM_OF_COLUMNS
+LOW_BITS = int.from_bytes(b"\x7f" * BOARD_BYTES, "little")
+HIGH_BITS = int.from_bytes(b"\x80" * BOARD_BYTES, "little")
+ALL_BITS = (1 << 8 * BOARD_BYTES) - 1
+NOT_LAST_COLUMN = int.from_bytes((b"\x80" * (NUM_OF_COLUMNS-1) + b"\x00") * NUM_OF_ROWS, "little")
+NOT_LAST_ROW = int.from_bytes(b"\x80" * (BOARD_BYTES-NUM_OF_COLUMNS) + b"\x00" * NUM_OF_COLUMNS, "little")
+NOT_FIRST_COLUMN = int.from_bytes((b"\x00" + b"\x80" * (NUM_OF_COLUMNS-1)) * NUM_OF_ROWS, "little")
+GEM_BYTES = [int.from_bytes(bytes([gem]) * BOARD_BYTES, "little") for gem in range(NUM_OF_GEMS+1)] #Every byte set to one gem type
+
+def zeroBytes(x):
+    """Returns the high bit of every byte of x that is zero"""
+    return ~(((x & LOW_BITS) + LOW_BITS) | x) & HIGH_BITS
+
+def findRuns(gems):
+    """Returns every run of 3 or more equal gems in a board array, as a RUN_DTYPE array.
+    Horizontal runs come first, row by row, then vertical runs, column by column. Every run is
+    reported once with its full length, and a cell can be in one horizontal and one vertical run."""
+    board = int.from_bytes(gems.tobytes(), "little")
+
+    #Shifted equality masks: a flag in the byte of every gem equal to its right (or lower) neighbour
+    sameRow = zeroBytes(board ^ (board >> 8)) & NOT_LAST_COLUMN
+    sameColumn = zeroBytes(board ^ (board >> ROW_SHIFT)) & NOT_LAST_ROW
+    filled = HIGH_BITS & ~zeroBytes(board ^ ALL_BITS) #EMPTY_SPACE is the byte 0xff
+
+    #A triple starts where two equal neighbours follow each other, and a run where that is not also true one step back
+    startRow = sameRow & (sameRow >> 8) & filled & ~(sameRow << 8)
+    startColumn = sameColumn & (sameColumn >> ROW_SHIFT) & filled & ~(sameColumn << ROW_SHIFT)
+    if not (startRow or startColumn):
+        return NO_RUNS #The usual case, so return before any per-run work
+
+    runs = []
+    for vertical, starts, same, step in ((False, startRow, sameRow, 8), (True, startColumn, sameColumn, ROW_SHIFT)):
+        found = []
+        while starts:
+            bit = starts & -starts #Lowest start left
+            starts ^= bit
+            length = 3
+            probe = bit << 2 * step
+            while same & probe:
+                length += 1
+                probe <<= step
+            row, column = divmod(bit.bit_length() // 8 - 1, NUM_OF_COLUMNS)
+            found.append((row, column, length, vertical, gems[row, column]))
+        if vertical:
+            found.sort(key=lambda run: (run[1], run[0]))
+        runs.extend(found)
+    return np.array(runs, dtype=RUN_DTYPE)
+
+def swapRuns(gems, pos1, pos2):
+    """Returns the runs that swapping the gems at pos1 and pos2 would create, as a RUN_DTYPE array ordered
+    like findRuns. Only the rows and columns through the two positions are looked at, and gems is not changed."""
+    #Every line through a swapped position, with the gems the swap would put on it
+    placed = {}
+    for (row, column), gem in ((pos1, int(gems[pos2])), (pos2, int(gems[pos1]))):
+        placed.setdefault((False, row), []).append((column, gem))
+        placed.setdefault((True, column), []).append((row, gem))
+
+    runs = []
+    for (vertical, index), changes in placed.items():
+        line = (gems[:, index] if vertical else gems[index]).tolist()
+        for position, gem in changes:
+            line[position] = gem
+        starts = set()
+        for position, gem in changes:
+            if gem == EMPTY_SPACE:
+                continue
+            start, end = position, position
+            while start > 0 and line[start-1] == gem:
+                start -= 1
+            while end < len(line) - 1 and line[end+1] == gem:
+                end += 1
+            if end - start >= 2 and start not in starts: #Both swapped gems can be in the same run
+                starts.add(start)
+                row, column = (start, index) if vertical else (index, start)
+                runs.append((row, column, end - start + 1, vertical, gem))
+
+    if not runs:
+        return NO_RUNS
+    runs.sort(key=lambda run: (run[3], run[1], run[0]) if run[3] else (run[3], run[0], run[1]))
+    return np.array(runs, dtype=RUN_DTYPE)
+
+def legalMoves(gems):
+    """Returns every swap of two adjacent gems that creates a match, as a (K, 4) int array of
+    (row1, column1, row2, column2) rows ordered by the first position, with row1 <= row2 and column1 <= column2.
+    All 112 pairs of an 8x8 board are checked at once, one gem type at a time, on the board packed like findRuns."""
+    board = int.from_bytes(gems.tobytes(), "little")
+    across, down = 0, 0 #Flags in the byte of the left (or upper) gem of every pair worth swapping
+    for gem in range(NUM_OF_GEMS+1):
+        here = zeroBytes(board ^ GEM_BYTES[gem])
+        if not here:
+            continue
+        #Flags in the byte of every space whose left, right, upper or lower neighbour is this gem
+        left = (here << 8) & NOT_FIRST_COLUMN
+        right = (here >> 8) & NOT_LAST_COLUMN
+        above = (here << ROW_SHIFT) & HIGH_BITS
+        below = here >> ROW_SHIFT
+        #Spaces that would complete a run if this gem was put there: the pattern templates of a move
+        twoLeft = left & (left << 8) & NOT_FIRST_COLUMN
+        twoRight = right & (right >> 8) & NOT_LAST_COLUMN
+        twoAbove = above & (above << ROW_SHIFT)
+        twoBelow = below & (below >> ROW_SHIFT)
+        columnRun = twoAbove | twoBelow | (above & below)
+        rowRun = twoLeft | twoRight | (left & right)
+        #A gem moving into a space leaves the one it came from, so that neighbour can not be part of the run
+        across |= ((left & (twoRight | columnRun)) >> 8) | (right & (twoLeft | columnRun))
+        down |= ((above & (twoBelow | rowRun)) >> ROW_SHIFT) | (below & (twoAbove | rowRun))
+
+    #Swapping two equal gems changes nothing
+    across &= ~zeroBytes(board ^ (board >> 8)) & NOT_LAST_COLUMN
+    down &= ~zeroBytes(board ^ (board >> ROW_SHIFT)) & NOT_LAST_ROW
+
+    moves = []
+    for flags, rowStep, columnStep in ((across, 0, 1), (down, 1, 0)):
+        while flags:
+            bit = flags & -flags
+            flags ^= bit
+            row, column = divmod(bit.bit_length() // 8 - 1, NUM_OF_COLUMNS)
+            moves.append((row, column, row+rowStep, column+columnStep))
+    moves.sort()
+    return np.array(moves, dtype=int).reshape(-1, 4)
+
+def runCells(run):
+    """Returns the (row, column) positions of the gems in a run, from its start"""
+    row, column, length = int(run["row"]), int(run["column"]), int(run["length"])
+    if run["vertical"]:
+        return [(row+i, column) for i in range(length)]
+    return [(row, column+i) for i in range(length)]
+
+def clearRuns(gems, special, runs):
+    """Clears the gems of the runs from the board arrays. A run of 4 leaves its first gem behind as a special gem,
+    runs longer than five score as five, and a run starting on a special gem scores a BONUS.
+    Returns how many runs of three, four and five were cleared and the bonus, as (threes, fours, fives, bonus)"""
+    threes, fours, fives, bonus = 0, 0, 0, 0
+    for run in runs:
+        match = runCells(run)
+        if special[match[0]]:
+            bonus += BONUS
+
+        if len(match) == 3:
+            threes += 1
+        elif len(match) == 4:
+            fours += 1
+            special[match[0]] = True
+            match = match[1:]
+        else:
+            fives += 1
+
+        for pos in match:
+            gems[pos] = EMPTY_SPACE
+            special[pos] = False
+
+    return threes, fours, fives, bonus
+
+def resolve(board, rng):
+    """Plays out every match on a board at once, without animating it: matches are cleared, the gems above
+    every empty space fall, new gems from rng (a numpy Generator) fill the top, and this repeats until no match is left.
+    board is a (gems, special) pair of arrays like GameBoard.gems and GameBoard.special, and is not changed.
+    Returns the new (gems, special) pair, the (threes, fours, fives, bonus) cleared over every cascade,
+    and how many times matches were cleared"""
+    gems, special = board[0].copy(), board[1].copy()
+    scores = [0, 0, 0, 0]
+    depth = 0
+    runs = findRuns(gems)
+    while len(runs) > 0:
+        depth += 1
+        for i, count in enumerate(clearRuns(gems, special, runs)):
+            scores[i] += count
+
+        #A run of 4 can leave its special gem on a space a crossing run has cleared, and no gem is left to carry it
+        special &= gems != EMPTY_SPACE
+        #A stable sort of every column on whether a space is filled moves the empty spaces to the top
+        #and keeps the gems above them in order, so all columns fall in one step
+        order = np.argsort(gems != EMPTY_SPACE, axis=0, kind="stable")
+        gems = np.take_along_axis(gems, order, axis=0)
+        special = np.take_along_axis(special, order, axis=0)
+        empty = gems == EMPTY_SPACE
+        gems[empty] = rng.integers(0, NUM_OF_GEMS+1, size=int(empty.sum()))
+
+        runs = findRuns(gems)
+    return (gems, special), tuple(scores), depth
+
 class GameBoard:
     def __init__(self):
         self.screen = pygame.display.get_surface()
@@ -29,7 +219,12 @@ class GameBoard:
         self.rows = NUM_OF_ROWS
         self.columns = NUM_OF_COLUMNS
 
-        #Set up the 2-D Array representing the board, setting each space to None
+        #The game state: the gem type in every space (EMPTY_SPACE if there is none) and which gems are special.
+        #All game logic works on these arrays, the Cells in self.board only draw them
+        self.gems = np.full((self.rows, self.columns), EMPTY_SPACE, dtype=np.int8)
+        self.special = np.zeros((self.rows, self.columns), dtype=bool)
+
+        #Set up the 2-D Array of Cells drawing the board, setting each space to None
         self.board = []
         for r in range(self.rows):
             self.board.append([])
@@ -59,29 +254,38 @@ class GameBoard:
             x = 0
             y += SPACE_SIZE
 
+        self.fillBoard()
+
         #Create the board 2-D array by adding cells to each empty space in the array
         for r in range(self.rows):
             for c in range(self.columns):
-                image = random.randint(0, NUM_OF_GEMS)
                 x,y = self.boardRects[r][c].left, self.boardRects[r][c].top - STARTING_Y
-                cell = Cell(image, (x,y))
+                cell = Cell(self, (r,c), (x,y))
                 self.board[r][c] = cell
+
+    def fillBoard(self):
+        #Fill the game state with random gems, without touching any pygame objects
+        for r in range(self.rows):
+            for c in range(self.columns):
+                self.gems[r, c] = random.randint(0, NUM_OF_GEMS)
+        self.special[:] = False
             
         #The board shouldn't start with any matches already present - so get rid of them
                 
         #Horizontally check for any matches on the board
+        gems = self.gems
         for row, column in itertools.product(range(self.rows), range(self.columns-2)):
-            if self.board[row][column].image == self.board[row][column+1].image == self.board[row][column+2].image: #Match!
+            if gems[row, column] == gems[row, column+1] == gems[row, column+2]: #Match!
                 #So we want to change the image index of the first gem in the match set
                 top, bottom, left, right = None, None, None, None #The 4 surrounding gems around the last gem in the match set
                 if row+1 < self.rows:
-                    bottom = self.board[row+1][column].image
+                    bottom = int(gems[row+1, column])
                 if row-1 > 0:
-                    top = self.board[row-1][column].image
+                    top = int(gems[row-1, column])
                 if column+1 < self.columns:
-                    right = self.board[row][column+1].image
+                    right = int(gems[row, column+1])
                 if column-1 > 0:
-                    left = self.board[row][column-1].image
+                    left = int(gems[row, column-1])
 
                 surrounding_gems = [top,bottom, left, right]
                 
@@ -93,23 +297,23 @@ class GameBoard:
                     if gem in gem_types:
                         gem_types.remove(gem)
 
-                self.board[row][column].image = random.choice(gem_types) #Then pick a new gem type from gem_types list.
+                gems[row, column] = random.choice(gem_types) #Then pick a new gem type from gem_types list.
                     
                     
 
         #Vertically check for any matches
         for row, column in itertools.product(range(self.rows-2), range(self.columns)): 
-            if self.board[row][column].image == self.board[row+1][column].image == self.board[row+2][column].image:
+            if gems[row, column] == gems[row+1, column] == gems[row+2, column]:
                 #Change the number of the first gem to any other number
                 top, bottom, left, right = None, None, None, None #The 4 surrounding gems around the last gem in the match set
                 if row+1 < self.rows:
-                    bottom = self.board[row+1][column].image
+                    bottom = int(gems[row+1, column])
                 if row-1 > 0:
-                    top = self.board[row-1][column].image
+                    top = int(gems[row-1, column])
                 if column+1 < self.columns:
-                    right = self.board[row][column+1].image
+                    right = int(gems[row, column+1])
                 if column-1 > 0:
-                    left = self.board[row][column-1].image
+                    left = int(gems[row, column-1])
 
                 surrounding_gems = [top,bottom, left, right]
                 
@@ -121,12 +325,22 @@ class GameBoard:
                     if gem in gem_types:
                         gem_types.remove(gem)
 
-                self.board[row][column].image = random.choice(gem_types) #Assign the first gem a random image that is not one of the four surrounding ones
+                gems[row, column] = random.choice(gem_types) #Assign the first gem a random image that is not one of the four surrounding ones
 
     def getBoard(self):
         """Returns board structure as a generator"""
         for row in self.board:
             yield row
+
+    def snapshot(self):
+        """Returns the game state as 128 bytes: the gem types followed by the special flags"""
+        return self.gems.tobytes() + self.special.tobytes()
+
+    def restore(self, snapshot):
+        """Sets the game state from a snapshot"""
+        size = self.rows * self.columns
+        self.gems[:] = np.frombuffer(snapshot[:size], dtype=np.int8).reshape(self.gems.shape)
+        self.special[:] = np.frombuffer(snapshot[size:], dtype=bool).reshape(self.special.shape)
     
     def startingAnimation(self):    
         if self.board[0][0].rect.top < self.boardRects[0][0].top:
@@ -158,13 +372,12 @@ class GameBoard:
     def swapGems(self, pos1, pos2):
         row1, column1 = pos1
         row2, column2 = pos2
-        print(pos1)
-        #Swap the cell images
-        self.board[row1][column1].image, self.board[row2][column2].image  = self.board[row2][column2].image, self.board[row1][column1].image
+        #Swap the gem types
+        self.gems[row1, column1], self.gems[row2, column2] = self.gems[row2, column2], self.gems[row1, column1]
         #Swap the cell's status, if one of them is a special gem
-        if self.board[row1][column1].special == True:
-            self.board[row1][column1].special = False #The first cell was a special gem but now its a normal gem
-            self.board[row2][column2].special = True #The second cell now is a special gem
+        if self.special[row1, column1]:
+            self.special[row1, column1] = False #The first cell was a special gem but now its a normal gem
+            self.special[row2, column2] = True #The second cell now is a special gem
 
     def animateSwap(self, pos1, pos2):
         row1, column1 = pos1
@@ -233,101 +446,31 @@ class GameBoard:
     def isValidMove(self, pos1, pos2):
         #Does the swap in question result in a match
         if self.checkIfAdjacent(pos1, pos2) == True:
-            self.swapGems(pos1, pos2)
-            
-            matches = self.checkForMatches()
-            if len(matches)>0:
-                self.swapGems(pos1, pos2)
-                return True
-            
-            self.swapGems(pos1, pos2)
+            return len(swapRuns(self.gems, pos1, pos2)) > 0
 
         return False
 
-    def checkForMatches(self):
-        skip = []
-        matches = []
-        #Re-write using itertools.product?
-        for row in self.board:
-            for column in range(self.columns-2):
-                if (row[column].image == row[column+1].image == row[column+2].image) and (row[column].image != EMPTY_SPACE):
-                    r = self.board.index(row)
-                    if (r,column) in skip:
-                        continue
+    def swapMatches(self, pos1, pos2):
+        """Returns the runs a swap would create as a RUN_DTYPE array, without swapping"""
+        return swapRuns(self.gems, pos1, pos2)
 
-                    else:
-                        match = [(r, column), (r, column+1), (r, column+2)]
-                        if column + 3 < self.columns and row[column+3].image == row[column].image:
-                            match.append((r, column+3))
-
-                        elif column + 4 < self.columns and row[column+4].image == row[column].image:
-                            match.append((r, column+4))
+    def legal_moves(self):
+        """Returns every swap that creates a match as a (K, 4) int array of (row1, column1, row2, column2)"""
+        return legalMoves(self.gems)
 
-                        matches.append(match)
-                        skip.extend(match)
+    def findMatches(self):
+        """Returns every run of 3 or more gems on the board as a RUN_DTYPE array"""
+        return findRuns(self.gems)
 
-                
-        skip = []
-        for column in range(self.columns):
-            for row in range(self.rows-2):
-                if (self.board[row][column].image == self.board[row+1][column].image == self.board[row+2][column].image) and (self.board[row][column].image != EMPTY_SPACE):
-                    if (row, column) in skip:
-                        continue
-                    else:
-                        match = [(row,column),(row+1,column), (row+2,column)]
-                        if row + 3 < self.rows and self.board[row+3][column].image == self.board[row][column].image:
-                            match.append((row+3, column))
-
-                        elif row + 4 < self.rows and self.board[row+4][column].image == self.board[row][column].image:
-                            match.append((row+4, column))
-
-                        matches.append(match)
-                        skip.extend(matches)
-                    
-        return matches
+    def checkForMatches(self):
+        """Returns the matches on the board, each as a list of (row, column) positions"""
+        return [runCells(run) for run in findRuns(self.gems)]
                     
     
     def removeMatches(self):
-        matches = self.checkForMatches()
-
-        threes = 0
-        fours = 0
-        fives = 0
-        bonus = 0
-
-        for match in matches:
-            print(len(match))
-            row, column = match[0]
-            if self.board[row][column].special == True:
-                bonus += BONUS
-                
-            if len(match) == 3:
-                threes += 1
-                for pos in match:
-                    row, column = pos
-                    self.board[row][column].image = EMPTY_SPACE
-                    self.board[row][column].special = False
-                    
-            elif len(match) == 4:
-                fours += 1
-                row1, column1 = match[0]
-                self.board[row1][column1].special = True
-                match.remove(match[0])
-                for pos in match:
-                    row, column = pos
-                    self.board[row][column].image = EMPTY_SPACE
-                    self.board[row][column].special = False
-                    
-            elif len(match) == 5:
-                fives += 1
-                for pos in match:
-                    row, column = pos
-                    self.board[row][column].image = EMPTY_SPACE
-                    self.board[row][column].special = False
-            
-
-        if len(matches) > 0:
-            return threes, fours, fives, bonus #There were matches
+        runs = findRuns(self.gems)
+        if len(runs) > 0:
+            return clearRuns(self.gems, self.special, runs) #There were matches
 
         return 0 #There were no matches, used to see if after pullDownGems, there needs to be an re-iteration for removing matches and pulling down again
 
@@ -338,7 +481,7 @@ class GameBoard:
         for dropSlot in dropSlots:
             row, column = dropSlot
             for r in range(row, -1, -1):
-                if self.board[r][column].image != EMPTY_SPACE:
+                if self.gems[r, column] != EMPTY_SPACE:
                     if self.board[r][column].rect.bottom != self.board[row][column].rect.bottom:
                         anim.append(self.board[r][column])
 
@@ -360,13 +503,13 @@ class GameBoard:
                 row, column = dropSlot
                 for r in range(row, -1, -1):
                     if r == 0:
-                        self.board[r][column].image = random.randint(0, NUM_OF_GEMS)
+                        self.gems[r, column] = random.randint(0, NUM_OF_GEMS)
 
                     else:
-                        self.board[r][column].image = self.board[r-1][column].image
-                        if self.board[r-1][column].special == True:
-                            self.board[r][column].special = True
-                            self.board[r-1][column].special = False
+                        self.gems[r, column] = self.gems[r-1, column]
+                        if self.special[r-1, column]:
+                            self.special[r, column] = True
+                            self.special[r-1, column] = False
 
             self.animationProgress = 0 #Reset animation progress meter
                     
@@ -377,9 +520,9 @@ class GameBoard:
         
         for r in range(self.rows):
             for c in range(self.columns):
-                if self.board[r][c].image == EMPTY_SPACE:
+                if self.gems[r, c] == EMPTY_SPACE:
                     if r + 1 < self.rows:
-                        while self.board[r+1][c].image == EMPTY_SPACE: #Find the bottom-most empty space in the column
+                        while self.gems[r+1, c] == EMPTY_SPACE: #Find the bottom-most empty space in the column
                             if r + 1 < self.rows-1:
                                 r += 1
                             else:
@@ -399,8 +542,40 @@ class GameBoard:
 
 
 class Cell:
-    def __init__(self, image, pos):
-        self.images = [pygame.image.load(os.path.join("images",'gem0.png')).convert_alpha(),
+    """Draws one space of a GameBoard; the gem type and special flag are read from the board's arrays"""
+    images = None #Gem images, loaded once for all cells
+    special_images = None
+
+    def __init__(self, gameBoard, index, pos):
+        if Cell.images is None:
+            Cell.loadImages()
+
+        self.gameBoard = gameBoard
+        self.index = index #(row, column) of the space this cell draws
+        self.rect = pygame.Rect(0,0,SPACE_SIZE, SPACE_SIZE)
+        self.rect.topleft = pos
+
+        self.direction = []
+
+    @property
+    def image(self):
+        return int(self.gameBoard.gems[self.index])
+
+    @image.setter
+    def image(self, value):
+        self.gameBoard.gems[self.index] = value
+
+    @property
+    def special(self):
+        return bool(self.gameBoard.special[self.index])
+
+    @special.setter
+    def special(self, value):
+        self.gameBoard.special[self.index] = value
+
+    @staticmethod
+    def loadImages():
+        Cell.images = [pygame.image.load(os.path.join("images",'gem0.png')).convert_alpha(),
                      pygame.image.load(os.path.join("images",'gem1.png')).convert_alpha(),
                      pygame.image.load(os.path.join("images",'gem2.png')).convert_alpha(),
                      pygame.image.load(os.path.join("images",'gem3.png')).convert_alpha(),
@@ -409,7 +584,7 @@ class Cell:
                      pygame.image.load(os.path.join("images",'gem6.png')).convert_alpha()]
         
         #special_images should be of same length as images
-        self.special_images = [pygame.image.load(os.path.join("images",'gem0 - special.png')).convert_alpha(),
+        Cell.special_images = [pygame.image.load(os.path.join("images",'gem0 - special.png')).convert_alpha(),
                              pygame.image.load(os.path.join("images",'gem1 - special.png')).convert_alpha(),
                              pygame.image.load(os.path.join("images",'gem2 - special.png')).convert_alpha(),
                              pygame.image.load(os.path.join("images",'gem3 - special.png')).convert_alpha(),
@@ -418,14 +593,6 @@ class Cell:
                              pygame.image.load(os.path.join("images",'gem6 - special.png')).convert_alpha()]
 
 
-        self.image = image
-        self.rect = pygame.Rect(0,0,SPACE_SIZE, SPACE_SIZE)
-        self.rect.topleft = pos
-
-        self.direction = []
-        self.special = False
-
-
     def draw(self, surface):
         if self.special == False:
             if self.image > EMPTY_SPACE:                                                                                                            
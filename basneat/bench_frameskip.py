@@ -0,0 +1,77 @@
+"""
+Benchmark of the decision interval: evolves the same starting population once per interval and reports
+how fast the generations fly and how good the birds still get when the networks are asked every k frames.
+
+Usage: python bench_frameskip.py [generations] [population size] [interval ...]
+"""
+import os
+import sys
+import time
+
+os.environ.setdefault("FLAPPY_HEADLESS", "1")  # Must be set before flappygame is imported
+
+import random
+import numpy as np
+import neatgame
+from neatgame import Config, InnovationTracker, MutationEngine, SpeciesSet, initial_population, run_episode
+from flappygame import Course
+
+TEST_COURSES = range(1000, 1005)  # Courses never flown during evolution
+
+
+def evolve(interval, generations, pop_size, seed=0):
+    """
+    Evolve a population from scratch, asking the networks every interval frames.
+    :param interval: decision interval k
+    :param generations: number of generations
+    :param pop_size: population size
+    :param seed: seed of the starting population, the mutations and the courses
+    :return: (frames flown, seconds spent flying, best genome of the last generation)
+    """
+    config = Config("config.txt")
+    config.decision_interval = interval
+    config.pop_size = pop_size
+    random.seed(seed)
+    neatgame.mutation = MutationEngine(config, seed)
+    neatgame.innovations = InnovationTracker()
+    limits = dict(max_frames=config.max_frames, settle_top_k=config.settle_top_k, decision_interval=interval)
+
+    population = initial_population(config.pop_size)
+    species_set = SpeciesSet(config)
+    frames = 0
+    seconds = 0.0
+    for generation in range(generations):
+        start = time.perf_counter()
+        frames += run_episode(population, headless=True, course=Course(seed + generation), **limits)
+        seconds += time.perf_counter() - start
+        best = max(population, key=lambda g: g.fitness)
+        if generation == generations - 1:
+            break
+        species_set.speciate(population, generation)
+        neatgame.innovations.new_generation()
+        population = species_set.reproduce(config.pop_size, generation)
+    return frames, seconds, best
+
+
+def test_fitness(genome, interval, max_frames):
+    """
+    Average fitness of a genome on the test courses, flown with the interval it evolved with.
+    """
+    fitness = []
+    for seed in TEST_COURSES:
+        run_episode([genome], headless=True, course=Course(seed), max_frames=max_frames, decision_interval=interval)
+        fitness.append(genome.fitness)
+    return float(np.mean(fitness))
+
+
+if __name__ == "__main__":
+    generations = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    pop_size = int(sys.argv[2]) if len(sys.argv) > 2 else Config("config.txt").pop_size
+    intervals = [int(k) for k in sys.argv[3:]] or [1, 2, 3, 5, 8]
+    max_frames = Config("config.txt").max_frames
+
+    print(f"{'k':>3} {'frames/s':>10} {'seconds':>8} {'best':>9} {'test':>9}")
+    for interval in intervals:
+        frames, seconds, best = evolve(interval, generations, pop_size)
+        print(f"{interval:>3} {frames / seconds:>10.0f} {seconds:>8.2f} {best.fitness:>9.1f} "
+              f"{test_fitness(best, interval, max_frames):>9.1f}")
@@ -1,7 +1,15 @@
 import os
-import pygame
 import random
 
+# Headless mode runs the game logic without a window, frame cap or event pumping.
+# Enable it with FLAPPY_HEADLESS=1; it also works on servers without a display.
+HEADLESS = os.environ.get("FLAPPY_HEADLESS", "") not in ("", "0")
+if HEADLESS:
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pygame
+
 pygame.font.init()  # init font
 
 
@@ -11,17 +19,64 @@ FLOOR = 730
 STAT_FONT = pygame.font.SysFont("comicsans", 50)
 END_FONT = pygame.font.SysFont("comicsans", 70)
 DRAW_LINES = False
+FPS = 30  # Simulated frames per second of game time
+
+if HEADLESS:
+    WIN = None
+else:
+    WIN = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
+    pygame.display.set_caption("Flappy Bird")
 
-WIN = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
-pygame.display.set_caption("Flappy Bird")
+def load_image(name):
+    """
+    Load an image from the imgs folder, converted for fast blitting when there is a window
+    :param name: file name (str)
+    :return: pygame Surface
+    """
+    image = pygame.image.load(os.path.join("imgs", name))
+    return image if HEADLESS else image.convert_alpha()
 
-pipe_img = pygame.transform.scale2x(pygame.image.load(os.path.join("imgs","pipe.png")).convert_alpha())
-bg_img = pygame.transform.scale(pygame.image.load(os.path.join("imgs","bg.png")).convert_alpha(), (600, 900))
-base_img = pygame.transform.scale2x(pygame.image.load(os.path.join("imgs","base.png")).convert_alpha())
+pipe_img = pygame.transform.scale2x(load_image("pipe.png"))
+bg_img = pygame.transform.scale(load_image("bg.png"), (600, 900))
+base_img = pygame.transform.scale2x(load_image("base.png"))
 bird_images = [pygame.transform.scale2x(pygame.image.load(os.path.join("imgs","bird" + str(x) + ".png"))) for x in range(1,4)]
 
 gen = 0
 
+def mask_array(mask):
+    """
+    Copy a mask into a boolean array, computed once per image so collision tests can be vectorized
+    :param mask: pygame Mask
+    :return: (height, width) boolean array, True where the mask is set
+    """
+    width, height = mask.get_size()
+    return np.array([[mask.get_at((x, y)) for x in range(width)] for y in range(height)], dtype=bool)
+
+def column_bits(mask):
+    """
+    Pack every column of a mask into an integer, bit r set when row r is solid
+    :param mask: pygame Mask at most 64 rows high
+    :return: (width,) uint64 array
+    """
+    solid = mask_array(mask)
+    assert solid.shape[0] <= 64, "column bits need masks at most 64 rows high"
+    weights = np.left_shift(np.uint64(1), np.arange(solid.shape[0], dtype=np.uint64))
+    return (solid * weights[:, None]).sum(axis=0, dtype=np.uint64)
+
+def column_spans(mask):
+    """
+    First and last solid row of every column of a mask whose columns are solid in one piece
+    :param mask: pygame Mask
+    :return: (first, last) int64 arrays, first > last for empty columns
+    """
+    solid = mask_array(mask)
+    height = solid.shape[0]
+    rows = np.arange(height)[:, None]
+    first = np.where(solid, rows, height).min(axis=0)
+    last = np.where(solid, rows, -1).max(axis=0)
+    assert ((last - first + 1 == solid.sum(axis=0)) | (last < first)).all(), "columns are not solid in one piece"
+    return first, last
+
 
 class Bird:
     """
@@ -31,6 +86,8 @@ class Bird:
     IMGS = bird_images
     ROT_VEL = 20
     ANIMATION_TIME = 5
+    MASKS = [pygame.mask.from_surface(img) for img in IMGS]
+    COLUMN_BITS = np.array([column_bits(mask) for mask in MASKS])  # (frame, column) solid rows
 
     def __init__(self, x, y):
         """
@@ -87,7 +144,7 @@ class Bird:
         """
         draw the bird
         :param win: pygame window or surface
-        :return: None
+        :return: Rect that was drawn
         """
         self.img_count += 1
 
@@ -111,14 +168,169 @@ class Bird:
 
 
         # tilt the bird
-        blitRotateCenter(win, self.img, (self.x, self.y), self.tilt)
+        return blitRotatedBird(win, self.IMGS.index(self.img), (self.x, self.y), self.tilt)
+
+    def get_mask(self):
+        """
+        gets the mask for the current image of the bird
+        :return: pygame Mask
+        """
+        return self.MASKS[self.IMGS.index(self.img)]
+
+
+class SwarmBird:
+    """
+    View of one bird inside a BirdSwarm, usable wherever a Bird is drawn or collided
+    """
+    __slots__ = ("swarm", "index")
+
+    def __init__(self, swarm, index):
+        self.swarm = swarm
+        self.index = index
+
+    @property
+    def x(self):
+        return self.swarm.x[self.index]
+
+    @property
+    def y(self):
+        return self.swarm.y[self.index]
+
+    @property
+    def tilt(self):
+        return self.swarm.tilt[self.index]
+
+    @property
+    def img(self):
+        return self.swarm.IMGS[self.swarm.frame[self.index]]
+
+    def draw(self, win):
+        """
+        draw the bird, advancing its flapping animation like Bird.draw
+        :param win: pygame window or surface
+        :return: Rect that was drawn
+        """
+        swarm, i = self.swarm, self.index
+        swarm.img_count[i] += 1
+        img_count = swarm.img_count[i]
+        step = swarm.ANIMATION_TIME
+
+        # For animation of bird, loop through frames 0, 1, 2, 1
+        if img_count <= step:
+            swarm.frame[i] = 0
+        elif img_count <= step*2:
+            swarm.frame[i] = 1
+        elif img_count <= step*3:
+            swarm.frame[i] = 2
+        elif img_count <= step*4:
+            swarm.frame[i] = 1
+        elif img_count == step*4 + 1:
+            swarm.frame[i] = 0
+            swarm.img_count[i] = 0
+
+        # so when bird is nose diving it isn't flapping
+        if swarm.tilt[i] <= -80:
+            swarm.frame[i] = 1
+            swarm.img_count[i] = step*2
+
+        return blitRotatedBird(win, swarm.frame[i], (self.x, self.y), self.tilt)
 
     def get_mask(self):
         """
         gets the mask for the current image of the bird
+        :return: pygame Mask
+        """
+        return self.swarm.MASKS[self.swarm.frame[self.index]]
+
+
+class BirdSwarm:
+    """
+    Many birds stored as NumPy arrays and moved together, following the same rules as Bird
+    """
+    MAX_ROTATION = Bird.MAX_ROTATION
+    IMGS = Bird.IMGS
+    ROT_VEL = Bird.ROT_VEL
+    ANIMATION_TIME = Bird.ANIMATION_TIME
+    MASKS = Bird.MASKS
+    COLUMN_BITS = Bird.COLUMN_BITS
+    WIDTH, HEIGHT = bird_images[0].get_size()  # All animation frames share one size
+
+    def __init__(self, x, y, count):
+        """
+        Initialize the swarm with every bird at the same spot
+        :param x: starting x pos (int)
+        :param y: starting y pos (int)
+        :param count: number of birds (int)
+        :return: None
+        """
+        self.x = np.full(count, x, dtype=np.int64)
+        self.y = np.full(count, y, dtype=np.float64)
+        self.tilt = np.zeros(count, dtype=np.int64)  # degrees to tilt
+        self.tick_count = np.zeros(count, dtype=np.int64)
+        self.vel = np.zeros(count, dtype=np.float64)
+        self.height = self.y.copy()
+        self.img_count = np.zeros(count, dtype=np.int64)
+        self.frame = np.zeros(count, dtype=np.int64)  # Index into IMGS
+
+    def __len__(self):
+        return len(self.y)
+
+    def __iter__(self):
+        return (SwarmBird(self, i) for i in range(len(self.y)))
+
+    def __getitem__(self, index):
+        return SwarmBird(self, index)
+
+    def jump(self, mask):
+        """
+        make the selected birds jump
+        :param mask: boolean array, one entry per bird
         :return: None
         """
-        return pygame.mask.from_surface(self.img)
+        mask = np.asarray(mask, dtype=bool)
+        self.vel[mask] = -10.5
+        self.tick_count[mask] = 0
+        self.height[mask] = self.y[mask]
+
+    def move(self):
+        """
+        move every bird by one frame
+        :return: None
+        """
+        self.tick_count += 1
+
+        # for downward acceleration
+        displacement = self.vel*self.tick_count + 0.5*(3)*self.tick_count**2
+
+        # terminal velocity
+        np.minimum(displacement, 16, out=displacement)
+        displacement[displacement < 0] -= 2
+
+        self.y += displacement
+
+        up = (displacement < 0) | (self.y < self.height + 50)
+        down = ~up & (self.tilt > -90)
+        self.tilt[up] = np.maximum(self.tilt[up], self.MAX_ROTATION)  # tilt up
+        self.tilt[down] -= self.ROT_VEL  # tilt down
+
+    def step(self, jump_mask=None):
+        """
+        apply the jumps decided on the current positions, then move every bird by one frame
+        :param jump_mask: boolean array, one entry per bird, or None for no jumps
+        :return: None
+        """
+        if jump_mask is not None:
+            self.jump(jump_mask)
+        self.move()
+
+    def keep(self, mask):
+        """
+        drop the birds where mask is False; SwarmBird views taken before become stale
+        :param mask: boolean array, one entry per bird
+        :return: None
+        """
+        for name in ("x", "y", "tilt", "tick_count", "vel", "height", "img_count", "frame"):
+            setattr(self, name, getattr(self, name)[mask])
 
 def blitRotateCenter(surf, image, topleft, angle):
     """
@@ -138,18 +350,76 @@ def blitRotateCenter(surf, image, topleft, angle):
     pygame.font.init()  # init font
 
 
+ROTATED_BIRDS = {}  # (animation frame, tilt) -> (rotated image, its rect, its mask)
+
+def bird_tilts():
+    """
+    Every tilt a bird reaches: it starts at 0, snaps up to MAX_ROTATION and drops by ROT_VEL until it passes -90
+    :return: sorted list of ints
+    """
+    tilts = set()
+    for tilt in (0, Bird.MAX_ROTATION):
+        tilts.add(tilt)
+        while tilt > -90:
+            tilt -= Bird.ROT_VEL
+            tilts.add(tilt)
+    return sorted(tilts)
+
+def rotated_bird(frame, tilt):
+    """
+    Get the rotated image of a bird animation frame, rotating and caching it on first use
+    :param frame: index into bird_images
+    :param tilt: degrees to tilt
+    :return: (rotated image, rect of the rotated image, mask of the rotated image)
+    """
+    sprite = ROTATED_BIRDS.get((frame, tilt))
+    if sprite is None:
+        image = pygame.transform.rotate(bird_images[frame], tilt)
+        mask = pygame.mask.from_surface(image)
+        if not HEADLESS:
+            image = image.convert_alpha()
+        sprite = ROTATED_BIRDS[(frame, tilt)] = (image, image.get_rect(), mask)
+    return sprite
+
+def blitRotatedBird(surf, frame, topleft, angle):
+    """
+    Blit a bird the same way as blitRotateCenter, using the cached rotated image
+    :param surf: the surface to blit to
+    :param frame: index into bird_images
+    :param topLeft: the top left position of the unrotated image
+    :param angle: degrees to tilt
+    :return: Rect that was drawn
+    """
+    rotated_image, rect, _ = rotated_bird(frame, angle)
+    new_rect = rect.copy()
+    new_rect.center = bird_images[frame].get_rect(topleft = topleft).center
+
+    return surf.blit(rotated_image, new_rect.topleft)
+
+for frame in range(len(bird_images)):
+    for tilt in bird_tilts():
+        rotated_bird(frame, tilt)
+
+
 class Pipe():
     """
     represents a pipe object
     """
     GAP = 200
     VEL = 5
-
-    def __init__(self, x):
+    PIPE_TOP = pygame.transform.flip(pipe_img, False, True)
+    PIPE_BOTTOM = pipe_img
+    WIDTH = pipe_img.get_width()
+    TOP_MASK = pygame.mask.from_surface(PIPE_TOP)
+    BOTTOM_MASK = pygame.mask.from_surface(PIPE_BOTTOM)
+    TOP_SPANS = column_spans(TOP_MASK)  # Solid rows of every column, for collide_swarm
+    BOTTOM_SPANS = column_spans(BOTTOM_MASK)
+
+    def __init__(self, x, height=None):
         """
         initialize pipe object
         :param x: int
-        :param y: int
+        :param height: height of the gap from the top of the screen, random when None
         :return" None
         """
         self.x = x
@@ -159,19 +429,17 @@ class Pipe():
         self.top = 0
         self.bottom = 0
 
-        self.PIPE_TOP = pygame.transform.flip(pipe_img, False, True)
-        self.PIPE_BOTTOM = pipe_img
-
         self.passed = False
 
-        self.set_height()
+        self.set_height(height)
 
-    def set_height(self):
+    def set_height(self, height=None):
         """
         set the height of the pipe, from the top of the screen
+        :param height: int, random when None
         :return: None
         """
-        self.height = random.randrange(50, 450)
+        self.height = random.randrange(50, 450) if height is None else int(height)
         self.top = self.height - self.PIPE_TOP.get_height()
         self.bottom = self.height + self.GAP
 
@@ -186,12 +454,13 @@ class Pipe():
         """
         draw both the top and bottom of the pipe
         :param win: pygame window/surface
-        :return: None
+        :return: list of the Rects that were drawn
         """
         # draw top
-        win.blit(self.PIPE_TOP, (self.x, self.top))
+        top_rect = win.blit(self.PIPE_TOP, (self.x, self.top))
         # draw bottom
-        win.blit(self.PIPE_BOTTOM, (self.x, self.bottom))
+        bottom_rect = win.blit(self.PIPE_BOTTOM, (self.x, self.bottom))
+        return [top_rect, bottom_rect]
 
 
     def collide(self, bird, win):
@@ -201,18 +470,88 @@ class Pipe():
         :return: Bool
         """
         bird_mask = bird.get_mask()
-        top_mask = pygame.mask.from_surface(self.PIPE_TOP)
-        bottom_mask = pygame.mask.from_surface(self.PIPE_BOTTOM)
-        top_offset = (self.x - bird.x, self.top - round(bird.y))
-        bottom_offset = (self.x - bird.x, self.bottom - round(bird.y))
+        bird_y = round(bird.y)
+        width, height = bird_mask.get_size()
+
+        # broad phase: only look at pixels when the bounding boxes overlap
+        if bird.x + width <= self.x or self.x + self.WIDTH <= bird.x:
+            return False
+        if bird_y < self.height:
+            if bird_mask.overlap(self.TOP_MASK, (self.x - bird.x, self.top - bird_y)):
+                return True
+        if bird_y + height > self.bottom:
+            if bird_mask.overlap(self.BOTTOM_MASK, (self.x - bird.x, self.bottom - bird_y)):
+                return True
+
+        return False
 
-        b_point = bird_mask.overlap(bottom_mask, bottom_offset)
-        t_point = bird_mask.overlap(top_mask,top_offset)
+    def collide_swarm(self, swarm):
+        """
+        returns which birds of a swarm collide with the pipe, pixel for pixel like collide
+        :param swarm: BirdSwarm object
+        :return: boolean array, one entry per bird
+        """
+        # pipe column under every bird column
+        columns = swarm.x[:, None] + np.arange(swarm.WIDTH) - self.x
+        inside = (columns >= 0) & (columns < self.WIDTH)
+        bird_y = np.round(swarm.y).astype(np.int64)
+        hit = np.zeros(len(swarm), dtype=bool)
+        # broad phase: birds beside the pipe or inside the gap cannot touch it
+        rows = inside.any(axis=1) & ((bird_y < self.height) | (bird_y + swarm.HEIGHT > self.bottom))
+        if not rows.any():
+            return hit
+
+        columns = np.clip(columns[rows], 0, self.WIDTH - 1)
+        bird_y = bird_y[rows][:, None]
+        bits = swarm.COLUMN_BITS[swarm.frame[rows]]
+        one = np.uint64(1)
+        overlap = np.zeros(columns.shape, dtype=bool)
+        for pipe_y, (first, last) in ((self.top, self.TOP_SPANS), (self.bottom, self.BOTTOM_SPANS)):
+            # solid pipe rows of each column as a bit range in the bird's own rows
+            low = np.clip(first[columns] + pipe_y - bird_y, 0, swarm.HEIGHT)
+            high = np.clip(last[columns] + pipe_y - bird_y + 1, low, swarm.HEIGHT)
+            span = np.left_shift(one, high.astype(np.uint64)) - np.left_shift(one, low.astype(np.uint64))
+            overlap |= (bits & span) != 0
+        hit[rows] = (overlap & inside[rows]).any(axis=1)
+        return hit
+
+class Course:
+    """
+    Pipe heights of one episode, drawn up front from a seed so the same seed always flies the same course
+    """
+    LENGTH = 256  # Heights generated at a time, more are drawn from the same generator when a bird gets further
 
-        if b_point or t_point:
-            return True
+    def __init__(self, seed=None):
+        """
+        Initialize the course
+        :param seed: int seed, or None for a new random course
+        :return: None
+        """
+        if seed is None:
+            seed = np.random.SeedSequence().entropy  # Keep the drawn seed so the course can be rebuilt
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.heights = self.rng.integers(50, 450, size=self.LENGTH)
+
+    def height(self, index):
+        """
+        get the height of a pipe, extending the course when needed
+        :param index: position of the pipe in the episode, counting from 0
+        :return: int
+        """
+        while index >= len(self.heights):
+            self.heights = np.concatenate((self.heights, self.rng.integers(50, 450, size=self.LENGTH)))
+        return int(self.heights[index])
+
+    def pipe(self, index, x):
+        """
+        create a pipe of the course
+        :param index: position of the pipe in the episode, counting from 0
+        :param x: int
+        :return: Pipe object
+        """
+        return Pipe(x, self.height(index))
 
-        return False
 
 class Base:
     """
@@ -249,13 +588,306 @@ class Base:
         """
         Draw the floor. This is two images that move together.
         :param win: the pygame surface/window
+        :return: list of the Rects that were drawn
+        """
+        return [win.blit(self.IMG, (self.x1, self.y)), win.blit(self.IMG, (self.x2, self.y))]
+
+
+
+
+class FlappyWorld:
+    """
+    Course, pipes, floor and clocks of an episode; FlappyEnv and VecEnv add the birds
+    """
+    BIRD_X = 230
+    BIRD_Y = 350
+    FIRST_PIPE_X = 700
+    FRAME_REWARD = 0.1  # For every frame a bird stays alive
+    PIPE_PENALTY = 1  # For hitting a pipe
+    PASS_REWARD = 5  # For every pipe passed
+
+    def reset_world(self, seed=None):
+        """
+        start a new episode on the course of the given seed
+        :param seed: course seed, None for a new random course
+        :return: None
+        """
+        self.course = Course(seed)
+        self.base = Base(FLOOR)
+        self.pipes = [self.course.pipe(0, self.FIRST_PIPE_X)]
+        self.pipe_count = 1  # Pipes taken from the course so far
+        self.pipe_ind = 0  # Pipe the birds look at
+        self.frame = 0  # Simulated frames
+        self.score = 0
+
+    def begin_frame(self):
+        """
+        advance the clocks and pick the pipe the birds look at, before the birds move
         :return: None
         """
-        win.blit(self.IMG, (self.x1, self.y))
-        win.blit(self.IMG, (self.x2, self.y))
+        self.frame += 1
+        # Add 1 point to score every second of game time
+        if self.frame % FPS == 0:
+            self.score += 1
+
+        self.pipe_ind = 0
+        if len(self.pipes) > 1 and self.BIRD_X > self.pipes[0].x + self.pipes[0].PIPE_TOP.get_width():
+            # once the birds passed the first pipe, they look at the second
+            self.pipe_ind = 1
+
+    def move_world(self, collide):
+        """
+        move the floor and pipes, checking every pipe for collisions after it moved
+        :param collide: called with each moved pipe, applies the collisions with it
+        :return: True if the birds passed a pipe this frame
+        """
+        self.base.move()
+
+        rem = []  # List to store pipes that need to be removed
+        add_pipe = False  # Flag to check if a new pipe needs to be added
+        for pipe in self.pipes:
+            pipe.move()
+            collide(pipe)
+
+            if pipe.x + pipe.PIPE_TOP.get_width() < 0:  # If the pipe is off the screen to the left
+                rem.append(pipe)
+
+            if not pipe.passed and pipe.x < self.BIRD_X:  # If the birds have passed the pipe
+                pipe.passed = True
+                add_pipe = True
+
+        if add_pipe:
+            self.score += 1
+            self.pipes.append(self.course.pipe(self.pipe_count, WIN_WIDTH))  # Add the next pipe of the course
+            self.pipe_count += 1
+
+        for r in rem:
+            self.pipes.remove(r)
+        return add_pipe
+
+    def observe(self, y):
+        """
+        observation of birds at height y: their height and distances to the top and bottom of the gap ahead
+        :param y: float or array of heights
+        :return: tuple of three, floats or arrays like y
+        """
+        pipe = self.pipes[self.pipe_ind]
+        return y, abs(y - pipe.height), abs(y - pipe.bottom)
+
+    def info(self):
+        """
+        :return: dict with the game score and the frame count
+        """
+        return {"score": self.score, "frame": self.frame}
+
+
+class FlappyEnv(FlappyWorld):
+    """
+    One bird playing the game, with a gym-style reset/step interface.
+    Rewards add up to the fitness eval_genomes has always used: FRAME_REWARD per frame alive, minus
+    PIPE_PENALTY for hitting a pipe and PASS_REWARD for each pipe passed. Leaving the screen ends the episode without a penalty.
+    """
+    def reset(self, seed=None):
+        """
+        start a new episode
+        :param seed: course seed, None for a new random course
+        :return: observation (y, distance to gap top, distance to gap bottom)
+        """
+        self.reset_world(seed)
+        self.bird = Bird(self.BIRD_X, self.BIRD_Y)
+        self.done = False
+        self.fitness = 0  # Sum of the rewards, including the first frame's
+        self.reward = 0  # Reward not yet returned by step(), so the first step() also returns the first frame's
+        self.begin_frame()
+        return self.observe(self.bird.y)
+
+    def begin_frame(self):
+        super().begin_frame()
+        self.fitness += self.FRAME_REWARD
+        self.reward += self.FRAME_REWARD
+        self.bird.move()
+
+    def step(self, action):
+        """
+        play one frame
+        :param action: True to jump
+        :return: (observation, reward, done, info)
+        """
+        if action:
+            self.bird.jump()
+
+        def collide(pipe):
+            if not self.done and pipe.collide(self.bird, None):
+                self.fitness -= self.PIPE_PENALTY
+                self.reward -= self.PIPE_PENALTY
+                self.done = True
+
+        if self.move_world(collide) and not self.done:
+            self.fitness += self.PASS_REWARD
+            self.reward += self.PASS_REWARD
+
+        # the bird hits the floor or goes too high
+        if self.bird.y + self.bird.img.get_height() - 10 >= FLOOR or self.bird.y < -50:
+            self.done = True
+
+        if not self.done:
+            self.begin_frame()
+        reward, self.reward = self.reward, 0
+        return self.observe(self.bird.y), reward, self.done, self.info()
+
+
+class VecEnv(FlappyWorld):
+    """
+    Many birds playing the same course in lockstep, one row per bird in every array.
+    Birds that are done stop moving; their rows keep their last observation and get no more reward.
+    """
+    def __init__(self, num_envs):
+        """
+        :param num_envs: number of birds (int)
+        """
+        self.num_envs = num_envs
+
+    def reset(self, seed=None):
+        """
+        start a new episode
+        :param seed: course seed, None for a new random course
+        :return: (num_envs, 3) array of observations
+        """
+        self.reset_world(seed)
+        self.birds = BirdSwarm(self.BIRD_X, self.BIRD_Y, self.num_envs)  # The birds still flying
+        self.active = np.arange(self.num_envs)  # Row of every bird still flying
+        self.done = np.zeros(self.num_envs, dtype=bool)
+        self.returns = np.zeros(self.num_envs)  # Sum of every row's rewards, including the first frame's
+        self.rewards = np.zeros(self.num_envs)  # Rewards not yet returned by step(), so the first step() also returns the first frame's
+        self.obs = np.zeros((self.num_envs, 3))
+        self.begin_frame()
+        return self.obs.copy()
+
+    def begin_frame(self):
+        super().begin_frame()
+        self.returns[self.active] += self.FRAME_REWARD
+        self.rewards[self.active] += self.FRAME_REWARD
+        self.birds.move()
+        self.obs[self.active] = np.column_stack(self.observe(self.birds.y))
+
+    def step(self, actions):
+        """
+        play one frame for every bird
+        :param actions: (num_envs,) booleans, True to jump; rows that are done are ignored
+        :return: (observations, rewards, dones, info)
+        """
+        self.birds.jump(np.asarray(actions, dtype=bool)[self.active])
+        alive = np.ones(len(self.birds), dtype=bool)
+
+        def collide(pipe):
+            hits = pipe.collide_swarm(self.birds) & alive
+            self.returns[self.active[hits]] -= self.PIPE_PENALTY
+            self.rewards[self.active[hits]] -= self.PIPE_PENALTY
+            alive[hits] = False
+
+        if self.move_world(collide):
+            self.returns[self.active[alive]] += self.PASS_REWARD
+            self.rewards[self.active[alive]] += self.PASS_REWARD
+
+        # Birds that hit the floor or go too high are done
+        alive &= (self.birds.y + self.birds.HEIGHT - 10 < FLOOR) & (self.birds.y >= -50)
+
+        if not alive.all():
+            self.done[self.active[~alive]] = True
+            self.birds.keep(alive)
+            self.active = self.active[alive]
+        if len(self.active):
+            self.begin_frame()
+        rewards, self.rewards = self.rewards, np.zeros(self.num_envs)
+        return self.obs.copy(), rewards, self.done.copy(), self.info()
+
+
+class Renderer:
+    """
+    Draws the game window, repainting and updating only the regions that changed since the last frame
+    """
+    def __init__(self, win):
+        """
+        Initialize the renderer; the first frame repaints the whole window
+        :param win: pygame window surface
+        :return: None
+        """
+        self.win = win
+        self.dirty = [win.get_rect()]  # Rects drawn on the previous frame, repainted with the background next frame
+        self.labels = {}  # HUD label position -> (text, rendered surface)
+
+    def invalidate(self):
+        """
+        repaint the whole window on the next frame, e.g. after it was covered
+        :return: None
+        """
+        self.dirty = [self.win.get_rect()]
+
+    def label(self, text, pos):
+        """
+        draw a HUD label, rendering it again only when its text changed
+        :param text: label text (str)
+        :param pos: top left position, x counted from the right edge when negative
+        :return: Rect that was drawn
+        """
+        cached = self.labels.get(pos)
+        if cached is None or cached[0] != text:
+            cached = self.labels[pos] = (text, STAT_FONT.render(text,1,(255,255,255)))
+        label = cached[1]
+        x, y = pos
+        if x < 0:
+            x = self.win.get_width() - label.get_width() + x
+        return self.win.blit(label, (x, y))
+
+    def draw(self, birds, pipes, base, score, gen, pipe_ind):
+        """
+        draw one frame and update the changed parts of the display
+        :param birds: Bird objects or a BirdSwarm
+        :param pipes: List of pipes
+        :param base: Base object
+        :param score: score of the game (int)
+        :param gen: current generation
+        :param pipe_ind: index of closest pipe
+        :return: None
+        """
+        win = self.win
+        if gen == 0:
+            gen = 1
+
+        # paint the background over everything drawn last frame, then draw every sprite again
+        previous = self.dirty
+        for rect in previous:
+            win.blit(bg_img, rect, rect)
+
+        drawn = []
+        for pipe in pipes:
+            drawn.extend(pipe.draw(win))
+
+        drawn.extend(base.draw(win))
+        for bird in birds:
+            # draw lines from bird to pipe
+            if DRAW_LINES:
+                try:
+                    drawn.append(pygame.draw.line(win, (255,0,0), (bird.x+bird.img.get_width()/2, bird.y + bird.img.get_height()/2), (pipes[pipe_ind].x + pipes[pipe_ind].PIPE_TOP.get_width()/2, pipes[pipe_ind].height), 5))
+                    drawn.append(pygame.draw.line(win, (255,0,0), (bird.x+bird.img.get_width()/2, bird.y + bird.img.get_height()/2), (pipes[pipe_ind].x + pipes[pipe_ind].PIPE_BOTTOM.get_width()/2, pipes[pipe_ind].bottom), 5))
+                except:
+                    pass
+            # draw bird
+            drawn.append(bird.draw(win))
+
+        # score
+        drawn.append(self.label("Score: " + str(score), (-15, 10)))
+
+        # generations
+        drawn.append(self.label("Gens: " + str(gen-1), (10, 10)))
 
+        # alive
+        drawn.append(self.label("Alive: " + str(len(birds)), (10, 50)))
 
+        pygame.display.update(previous + drawn)
+        self.dirty = drawn
 
+renderer = None  # Renderer of the last window passed to draw_window
 
 def draw_window(win, birds, pipes, base, score, gen, pipe_ind):
     """
@@ -268,35 +900,7 @@ def draw_window(win, birds, pipes, base, score, gen, pipe_ind):
     :param pipe_ind: index of closest pipe
     :return: None
     """
-    if gen == 0:
-        gen = 1
-    win.blit(bg_img, (0,0))
-
-    for pipe in pipes:
-        pipe.draw(win)
-
-    base.draw(win)
-    for bird in birds:
-        # draw lines from bird to pipe
-        if DRAW_LINES:
-            try:
-                pygame.draw.line(win, (255,0,0), (bird.x+bird.img.get_width()/2, bird.y + bird.img.get_height()/2), (pipes[pipe_ind].x + pipes[pipe_ind].PIPE_TOP.get_width()/2, pipes[pipe_ind].height), 5)
-                pygame.draw.line(win, (255,0,0), (bird.x+bird.img.get_width()/2, bird.y + bird.img.get_height()/2), (pipes[pipe_ind].x + pipes[pipe_ind].PIPE_BOTTOM.get_width()/2, pipes[pipe_ind].bottom), 5)
-            except:
-                pass
-        # draw bird
-        bird.draw(win)
-
-    # score
-    score_label = STAT_FONT.render("Score: " + str(score),1,(255,255,255))
-    win.blit(score_label, (WIN_WIDTH - score_label.get_width() - 15, 10))
-
-    # generations
-    score_label = STAT_FONT.render("Gens: " + str(gen-1),1,(255,255,255))
-    win.blit(score_label, (10, 10))
-
-    # alive
-    score_label = STAT_FONT.render("Alive: " + str(len(birds)),1,(255,255,255))
-    win.blit(score_label, (10, 50))
-
-    pygame.display.update()
\ No newline at end of file
+    global renderer
+    if renderer is None or renderer.win is not win:
+        renderer = Renderer(win)
+    renderer.draw(birds, pipes, base, score, gen, pipe_ind)
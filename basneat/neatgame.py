@@ -1,4 +1,6 @@
-import random, math
+import random, math, os
+import configparser
+import multiprocessing
 import numpy as np
 import pygame
 import time
@@ -6,314 +8,1094 @@ from flappygame import *
 import matplotlib.pyplot as plt
 import networkx as nx
 
+class Config:
+    """
+    Run settings, read from a neat-python style config file such as config.txt.
+    Every option becomes an attribute; options missing from the file keep the
+    default listed here.
+    """
+    DEFAULTS = {
+        "NEAT": {
+            "pop_size": 50,
+            "fitness_threshold": float("inf"),
+        },
+        "DefaultGenome": {
+            "conn_add_prob": 0.5,
+            "node_add_prob": 0.2,
+            "weight_init_mean": 0.0,
+            "weight_init_stdev": 1.0,
+            "weight_max_value": 30.0,
+            "weight_min_value": -30.0,
+            "weight_mutate_power": 0.5,
+            "weight_mutate_rate": 0.8,
+            "weight_replace_rate": 0.1,
+            "compatibility_excess_coefficient": 1.0,
+            "compatibility_disjoint_coefficient": 1.0,
+            "compatibility_weight_coefficient": 0.5,
+            "compatibility_small_genome": 20,
+        },
+        "DefaultSpeciesSet": {
+            "compatibility_threshold": 3.0,
+        },
+        "DefaultStagnation": {
+            "max_stagnation": 20,
+            "species_elitism": 2,
+        },
+        "DefaultReproduction": {
+            "elitism": 2,
+            "survival_threshold": 0.2,
+        },
+        "Episode": {
+            "max_frames": 0,
+            "settle_top_k": 0,
+            "decision_interval": 1,
+        },
+    }
+
+    def __init__(self, path=None):
+        """
+        :param path: config file to read, or None for the defaults
+        """
+        parser = configparser.ConfigParser()
+        if path is not None and not parser.read(path):
+            raise FileNotFoundError(f"Config file {path} not found")
+        for section, options in self.DEFAULTS.items():
+            for key, default in options.items():
+                setattr(self, key, type(default)(parser.get(section, key, fallback=default)))
+
+config = Config()  # Default settings, replaced in __main__ by the contents of config.txt
+
+# Row layouts of the struct-of-arrays genome storage
+NODE_DTYPE = np.dtype([
+    ("id", np.int32),       # Unique identifier for the node
+    ("layer", np.float64),  # Layer in the network (0 = input, 1 = output, in between = hidden)
+    ("value", np.float64),  # The value held by the node
+])
+CONNECTION_DTYPE = np.dtype([
+    ("from_id", np.int32),     # Id of the node from which the connection originates
+    ("to_id", np.int32),       # Id of the node to which the connection leads
+    ("weight", np.float64),    # The weight of the connection
+    ("enabled", np.bool_),     # Whether the connection is enabled or not
+    ("innovation", np.int32),  # Innovation number of the (from_id, to_id) pair
+])
+
 class Node:
-    def __init__(self, id, layer):
-        self.id = id        # Unique identifier for the node
-        self.layer = layer  # Layer in the network (e.g., input, hidden, output)
-        self.value = 0.0    # The value held by the node, initially set to 0.0
-        self.input_sum = 0.0  # Sum of inputs before activation
-    
-    def activate(self):
-        # Clip the input sum to avoid overflow in the exp function
-        # self.input_sum = np.clip(self.input_sum, -500, 500)
-        #self.value = 1.0 / (1.0 + math.exp(-self.input_sum))
-        self.value = math.tanh(self.input_sum)
+    """
+    View of one row of a Genome's node array, kept for backward-compatible access.
+    Reads and writes go straight to the genome's arrays.
+    """
+    __slots__ = ("genome", "index")
+
+    def __init__(self, genome, index):
+        self.genome = genome  # Genome that owns the node
+        self.index = index    # Row of the node in genome.node_array
+
+    def __eq__(self, other):
+        return isinstance(other, Node) and self.genome is other.genome and self.index == other.index
+
+    def __hash__(self):
+        return hash((id(self.genome), self.index))
+
+    @property
+    def id(self):
+        return int(self.genome.node_array["id"][self.index])
+
+    @property
+    def layer(self):
+        return float(self.genome.node_array["layer"][self.index])
+
+    @layer.setter
+    def layer(self, layer):
+        self.genome.node_array["layer"][self.index] = layer
+        self.genome._edges = None  # Layers feed the cycle check, rebuild the index on next use
+
+    @property
+    def value(self):
+        return float(self.genome.node_array["value"][self.index])
+
+    @value.setter
+    def value(self, value):
+        self.genome.node_array["value"][self.index] = value
 
 class Connection:
-    def __init__(self, from_node, to_node, weight, enabled=True):
-        self.from_node = from_node  # The node from which the connection originates
-        self.to_node = to_node      # The node to which the connection leads
-        self.weight = weight        # The weight of the connection
-        self.enabled = enabled      # Whether the connection is enabled or not
+    """
+    View of one row of a Genome's connection array, kept for backward-compatible access.
+    Reads and writes go straight to the genome's arrays.
+    """
+    __slots__ = ("genome", "index")
+
+    def __init__(self, genome, index):
+        self.genome = genome  # Genome that owns the connection
+        self.index = index    # Row of the connection in genome.connection_array
+
+    def __eq__(self, other):
+        return isinstance(other, Connection) and self.genome is other.genome and self.index == other.index
+
+    def __hash__(self):
+        return hash((id(self.genome), self.index))
+
+    @property
+    def from_node(self):
+        return Node(self.genome, self.genome.node_index(self.genome.connection_array["from_id"][self.index]))
+
+    @property
+    def to_node(self):
+        return Node(self.genome, self.genome.node_index(self.genome.connection_array["to_id"][self.index]))
+
+    @property
+    def weight(self):
+        return float(self.genome.connection_array["weight"][self.index])
+
+    @weight.setter
+    def weight(self, weight):
+        self.genome.connection_array["weight"][self.index] = weight
+
+    @property
+    def enabled(self):
+        return bool(self.genome.connection_array["enabled"][self.index])
+
+    @enabled.setter
+    def enabled(self, enabled):
+        self.genome.connection_array["enabled"][self.index] = enabled
+
+    @property
+    def innovation(self):
+        return int(self.genome.connection_array["innovation"][self.index])
+
+GENERATED_CACHE_SIZE = 10000  # Generated network functions kept before the cache is emptied
+_generated_functions = {}  # Generated source -> compiled function
+
+class CompiledNetwork:
+    """
+    Frozen, topologically ordered form of a Genome used for fast evaluation.
+    Input nodes take the first slots of a flat value list and the remaining nodes
+    follow in topological order. The enabled connections are flattened into
+    contiguous target/source/weight tuples sorted by target slot, and grouped
+    per target node as (slot, ((source slot, weight), ...)) once at compile time,
+    so activate() is a single pass over the nodes with no per-edge branching.
+    """
+    __slots__ = ("node_ids", "num_inputs", "output_slots", "edge_dst", "edge_src", "edge_weight", "nodes", "_padding")
+
+    def __init__(self, node_ids, num_inputs, output_slots, edge_dst, edge_src, edge_weight):
+        self.node_ids = node_ids          # Genome node id held in every slot
+        self.num_inputs = num_inputs      # The first num_inputs slots receive the network inputs
+        self.output_slots = output_slots  # Slots read back as the network outputs
+        self.edge_dst = edge_dst          # Target slot of every edge, ascending
+        self.edge_src = edge_src          # Source slot of every edge
+        self.edge_weight = edge_weight    # Weight of every edge
+        self._padding = [0.0] * (len(node_ids) - num_inputs)
+
+        # The edges of every target node gathered into (slot, ((source slot, weight), ...)), ascending by slot
+        grouped = {}
+        for dst, src, weight in zip(edge_dst, edge_src, edge_weight):
+            grouped.setdefault(dst, []).append((src, weight))
+        self.nodes = tuple((dst, tuple(edges)) for dst, edges in grouped.items())
+
+    def evaluate(self, inputs):
+        """
+        Run one forward pass and return the value of every slot
+        :param inputs: sequence with one value per input node
+        :return: list of node values, indexed by slot
+        """
+        if len(inputs) != self.num_inputs:
+            raise ValueError(f"Number of inputs ({len(inputs)}) does not match number of input nodes ({self.num_inputs})")
+        values = list(inputs)
+        values += self._padding  # Nodes without enabled inputs keep tanh(0.0) == 0.0
+
+        tanh = math.tanh
+        for slot, edges in self.nodes:  # Sources computed later still read 0.0
+            total = 0.0
+            for src, weight in edges:
+                total += values[src] * weight
+            values[slot] = tanh(total)
+        return values
+
+    def activate(self, inputs):
+        values = self.evaluate(inputs)
+        return [values[slot] for slot in self.output_slots]
+
+    def source(self, name="net"):
+        """
+        Straight-line Python source for this network: one local variable per node,
+        the weights as literals and math.tanh bound as a default argument.
+        :param name: name of the generated function
+        :return: str
+        """
+        arguments = [f"v{slot}" for slot in range(self.num_inputs)]
+        lines = [f"def {name}({', '.join(arguments)}, tanh=tanh):"]
+        terms = {}
+        for dst, src, weight in zip(self.edge_dst, self.edge_src, self.edge_weight):
+            if src < dst:  # Sources computed later read 0.0 in evaluate() too
+                terms.setdefault(dst, []).append(f"v{src} * {weight!r}")
+        for slot in range(self.num_inputs, len(self.node_ids)):
+            if slot in terms:
+                lines.append(f"    v{slot} = tanh({' + '.join(terms[slot])})")
+            else:
+                lines.append(f"    v{slot} = 0.0")
+        outputs = "".join(f"v{slot}, " for slot in self.output_slots)
+        lines.append(f"    return ({outputs})")
+        return "\n".join(lines) + "\n"
+
+    def function(self):
+        """
+        The network as a generated Python function, compiled once and cached by source
+        :return: function taking one positional argument per input and returning a tuple of outputs
+        """
+        source = self.source()
+        function = _generated_functions.get(source)
+        if function is None:
+            if len(_generated_functions) >= GENERATED_CACHE_SIZE:
+                _generated_functions.clear()
+            namespace = {"tanh": math.tanh}
+            exec(compile(source, "<generated network>", "exec"), namespace)
+            function = _generated_functions[source] = namespace["net"]
+        return function
+
+class PopulationNetwork:
+    """
+    The compiled networks of a whole population packed into padded NumPy tensors.
+    Every node is placed on a level (longest path from the inputs) and each level
+    gets one (N, width, sources) weight block, so a forward pass costs one batched
+    matrix product per level no matter how many genomes are evaluated.
+    """
+    def __init__(self, networks):
+        """
+        :param networks: list of CompiledNetwork objects, all with the same number of inputs and outputs
+        """
+        num_inputs = networks[0].num_inputs
+        num_outputs = len(networks[0].output_slots)
+
+        # Level of every slot of every network; edges only ever point to a later slot
+        depths = []
+        for net in networks:
+            depth = [0] * len(net.node_ids)
+            for slot in range(num_inputs, len(depth)):
+                depth[slot] = 1
+            for dst, src in zip(net.edge_dst, net.edge_src):
+                if src < dst:  # Back edges of a cycle read 0.0 in CompiledNetwork as well
+                    depth[dst] = max(depth[dst], depth[src] + 1)
+            depths.append(depth)
+        num_levels = max(max(depth) for depth in depths)
+
+        # Column layout: the inputs, then one padded block per level
+        widths = [max(depth.count(level) for depth in depths) for level in range(1, num_levels + 1)]
+        starts = [num_inputs]
+        for width in widths:
+            starts.append(starts[-1] + width)
+
+        self.size = starts[-1]
+        self.num_inputs = num_inputs
+        self.blocks = [np.zeros((len(networks), width, start)) for width, start in zip(widths, starts)]
+        self.output_columns = np.zeros((len(networks), num_outputs), dtype=np.intp)
+
+        for row, (net, depth) in enumerate(zip(networks, depths)):
+            column = list(range(num_inputs)) + [0] * (len(depth) - num_inputs)
+            filled = [0] * (num_levels + 1)
+            for slot in range(num_inputs, len(depth)):
+                level = depth[slot]
+                column[slot] = starts[level - 1] + filled[level]
+                filled[level] += 1
+            for dst, src, weight in zip(net.edge_dst, net.edge_src, net.edge_weight):
+                if src < dst:
+                    level = depth[dst]
+                    self.blocks[level - 1][row, column[dst] - starts[level - 1], column[src]] += weight
+            self.output_columns[row] = [column[slot] for slot in net.output_slots]
+
+        self.rows = np.arange(len(networks))[:, None]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def keep(self, mask):
+        """
+        Drop the rows of genomes that are no longer evaluated
+        :param mask: boolean array, True for every row to keep
+        :return: None
+        """
+        self.blocks = [block[mask] for block in self.blocks]
+        self.output_columns = self.output_columns[mask]
+        self.rows = np.arange(len(self.output_columns))[:, None]
+
+    def activate(self, observations):
+        """
+        Evaluate every genome on its own observation in one vectorized pass
+        :param observations: (N, num_inputs) array, row i is fed to genome i
+        :return: (N, num_outputs) array of output values
+        """
+        values = np.zeros((len(self.rows), self.size))
+        values[:, :self.num_inputs] = observations
+        start = self.num_inputs
+        for block in self.blocks:
+            end = start + block.shape[1]
+            values[:, start:end] = np.tanh(np.matmul(block, values[:, :start, None])[:, :, 0])
+            start = end
+        return values[self.rows, self.output_columns]
+
+class InnovationTracker:
+    """
+    Hands out population-wide innovation numbers and node ids. Within one generation
+    the same structural mutation, a new (from, to) connection or the split of a
+    (from, to) connection, gets the same number in every genome, so genes line up
+    across genomes for crossover and speciation.
+    """
+    def __init__(self):
+        self.next_innovation = 1  # Next unused connection innovation number
+        self.next_node_id = 0     # Next unused node id for nodes created by splits
+        self.connections = {}     # (from_id, to_id) -> innovation number, current generation
+        self.splits = {}          # (from_id, to_id) -> id of the node splitting it, current generation
+
+    def connection(self, from_id, to_id):
+        key = (from_id, to_id)
+        if key not in self.connections:
+            self.connections[key] = self.next_innovation
+            self.next_innovation += 1
+        return self.connections[key]
+
+    def split(self, from_id, to_id, genome):
+        # Node id for the node inserted into the (from_id, to_id) connection of genome
+        key = (from_id, to_id)
+        node_id = self.splits.get(key)
+        if node_id is None or (genome.node_array["id"] == node_id).any():
+            node_id = max(self.next_node_id, genome.node_id_counter)  # Never collide with the initial nodes
+            self.next_node_id = node_id + 1
+            self.splits[key] = node_id
+        return node_id
+
+    def new_generation(self):
+        # Identical mutations in different generations are new innovations
+        self.connections.clear()
+        self.splits.clear()
+
+innovations = InnovationTracker()  # Shared by every genome of the population
+
+class MutationEngine:
+    """
+    Applies the mutation rates of a Config with one seeded np.random.Generator.
+    Weight mutation is a handful of array operations, either over one genome's
+    weights or over the concatenated weights of a whole population.
+    """
+    def __init__(self, config, seed=None):
+        self.config = config
+        self.rng = np.random.default_rng(seed)
+
+    def mutate_weights(self, weights):
+        """
+        Perturb, replace and clip an array of weights in place
+        :param weights: float array of any shape
+        :return: None
+        """
+        config = self.config
+        roll = self.rng.random(weights.shape)
+        perturb = roll < config.weight_mutate_rate
+        replace = ~perturb & (roll < config.weight_mutate_rate + config.weight_replace_rate)
+        weights[perturb] += self.rng.uniform(-config.weight_mutate_power, config.weight_mutate_power, perturb.sum())
+        weights[replace] = self.rng.normal(config.weight_init_mean, config.weight_init_stdev, replace.sum())
+        np.clip(weights, config.weight_min_value, config.weight_max_value, out=weights)
+
+    def mutate_structure(self, genome):
+        if self.rng.random() < self.config.node_add_prob:
+            genome.mutate_add_node(self.rng)
+        if self.rng.random() < self.config.conn_add_prob:
+            genome.mutate_add_connection(self.rng)
+
+    def mutate(self, genome):
+        self.mutate_structure(genome)
+        self.mutate_weights(genome.connection_array["weight"])
+
+    def mutate_population(self, genomes):
+        """
+        Mutate every genome, with the weights of all genomes mutated as one array
+        :param genomes: list of Genome objects
+        :return: None
+        """
+        for genome in genomes:
+            self.mutate_structure(genome)
+        sizes = [len(genome.connection_array) for genome in genomes]
+        weights = np.concatenate([genome.connection_array["weight"] for genome in genomes])
+        self.mutate_weights(weights)
+        for genome, mutated in zip(genomes, np.split(weights, np.cumsum(sizes)[:-1])):
+            genome.connection_array["weight"] = mutated
+
+mutation = MutationEngine(config)  # Shared by every genome of the population
+
+class AdjacencyIndex:
+    """
+    Edge set of a genome. Answers "does this edge exist?" in constant time and
+    "would this edge close a cycle?" in constant time while every edge points
+    from a lower to a higher layer, which the structural mutations guarantee;
+    only genomes with hand-made backward edges fall back to a graph search.
+    """
+    __slots__ = ("successors", "layers", "backward_edges")
+
+    def __init__(self, genome):
+        self.successors = {}  # Node id -> set of node ids it has a connection to
+        self.layers = dict(zip(genome.node_array["id"].tolist(), genome.node_array["layer"].tolist()))
+        self.backward_edges = 0  # Connections that do not point to a higher layer
+        for from_id, to_id in zip(genome.connection_array["from_id"].tolist(), genome.connection_array["to_id"].tolist()):
+            self.add_edge(from_id, to_id)
+
+    def add_node(self, node_id, layer):
+        self.layers[node_id] = layer
+
+    def add_edge(self, from_id, to_id):
+        self.successors.setdefault(from_id, set()).add(to_id)
+        if self.layers[from_id] >= self.layers[to_id]:
+            self.backward_edges += 1
+
+    def has_edge(self, from_id, to_id):
+        return to_id in self.successors.get(from_id, ())
+
+    def would_create_cycle(self, from_id, to_id):
+        if from_id == to_id:
+            return True
+        if not self.backward_edges and self.layers[from_id] < self.layers[to_id]:
+            return False  # All paths climb in layer, so nothing leads from to_id back down to from_id
+        stack = [to_id]
+        seen = {to_id}
+        while stack:
+            for next_id in self.successors.get(stack.pop(), ()):
+                if next_id == from_id:
+                    return True
+                if next_id not in seen:
+                    seen.add(next_id)
+                    stack.append(next_id)
+        return False
 
 class Genome:
+    """
+    Genome stored as two structured NumPy arrays, one row per node and one row per
+    connection. Node and Connection objects are only views on those rows; bulk
+    operations such as weight mutation work on the arrays directly.
+    """
+    __slots__ = ("id", "node_array", "connection_array", "fitness", "_edges")
+
     def __init__(self, id):
         self.id = id
-        self.nodes = []  # List to store nodes
-        self.connections = []  # List to store connections
-        self.node_id_counter = 0  # Counter for assigning unique node IDs
-        self.connection_innovations = {}  # Dictionary to track unique connections
+        self.node_array = np.zeros(0, dtype=NODE_DTYPE)  # One row per node
+        self.connection_array = np.zeros(0, dtype=CONNECTION_DTYPE)  # One row per connection
         self.fitness = 0.0  # Fitness value of the genome
-        self.input_nodes = []
-        self.output_nodes = []
-
-    def add_node(self, layer):
-        node = Node(self.node_id_counter, layer) # Create a new node with a unique ID and specified layer
-        self.nodes.append(node) # Add the new node to the nodes list
-        self.node_id_counter += 1 # Increment the node ID counter
-        if layer == 0:  # Input layer
-            self.input_nodes.append(node)
-        elif layer == 1:  # Output layer
-            self.output_nodes.append(node)
-        return node # Return the newly created node 
+        self._edges = None  # AdjacencyIndex, built on first use
+
+    @property
+    def edges(self):
+        if self._edges is None:
+            self._edges = AdjacencyIndex(self)
+        return self._edges
+
+    @property
+    def nodes(self):
+        return [Node(self, i) for i in range(len(self.node_array))]
+
+    @property
+    def connections(self):
+        return [Connection(self, i) for i in range(len(self.connection_array))]
+
+    @property
+    def input_nodes(self):
+        return [Node(self, i) for i in np.flatnonzero(self.node_array["layer"] == 0)]
+
+    @property
+    def output_nodes(self):
+        return [Node(self, i) for i in np.flatnonzero(self.node_array["layer"] == 1)]
+
+    @property
+    def node_id_counter(self):
+        # Next unused node id
+        return int(self.node_array["id"].max()) + 1 if len(self.node_array) else 0
+
+    def node_index(self, node_id):
+        # Row of the node with the given id
+        return int(np.flatnonzero(self.node_array["id"] == node_id)[0])
+
+    def copy(self, id=None):
+        child = Genome(self.id if id is None else id)
+        child.node_array = self.node_array.copy()
+        child.connection_array = self.connection_array.copy()
+        child.fitness = self.fitness
+        return child
+
+    def add_node(self, layer, node_id=None):
+        if node_id is None:
+            node_id = self.node_id_counter
+        row = np.array([(node_id, layer, 0.0)], dtype=NODE_DTYPE)  # New node with a unique ID and specified layer
+        self.node_array = np.concatenate((self.node_array, row))
+        if self._edges is not None:
+            self._edges.add_node(node_id, layer)
+        return Node(self, len(self.node_array) - 1)  # Return a view of the newly created node
 
     def add_connection(self, from_node, to_node, weight):
-        key = (from_node.id, to_node.id)  # Create a unique key for the connection
-        if key not in self.connection_innovations:
-            self.connection_innovations[key] = len(self.connection_innovations) + 1  # Assign a unique innovation number
-        innovation_number = self.connection_innovations[key]  # Retrieve the innovation number
-        connection = Connection(from_node, to_node, weight)  # Create a new connection with the specified weight
-        self.connections.append(connection)  # Add the new connection to the connections list
+        return self.add_connection_by_id(from_node.id, to_node.id, weight)
+
+    def add_connection_by_id(self, from_id, to_id, weight, enabled=True):
+        innovation = innovations.connection(from_id, to_id)  # Population-wide innovation number
+        row = np.array([(from_id, to_id, weight, enabled, innovation)], dtype=CONNECTION_DTYPE)
+        self.connection_array = np.concatenate((self.connection_array, row))
+        if self._edges is not None:
+            self._edges.add_edge(from_id, to_id)
+        return Connection(self, len(self.connection_array) - 1)
 
     def set_inputs(self, inputs):
-        if len(inputs) != len(self.input_nodes):
-            raise ValueError(f"Number of inputs ({len(inputs)}) does not match number of input nodes ({len(self.input_nodes)})")
-        for i, value in enumerate(inputs):
-            self.input_nodes[i].value = value
+        input_rows = np.flatnonzero(self.node_array["layer"] == 0)
+        if len(inputs) != len(input_rows):
+            raise ValueError(f"Number of inputs ({len(inputs)}) does not match number of input nodes ({len(input_rows)})")
+        self.node_array["value"][input_rows] = inputs
+
+    def prune(self):
+        """
+        Copy of the genome without the structure that can not affect get_outputs():
+        disabled connections, hidden nodes that no input reaches (they always hold
+        tanh(0.0) == 0.0) and hidden nodes with no path to an output. The full
+        genome is left untouched for breeding; the copy is meant for evaluation.
+        :return: Genome
+        """
+        layers = dict(zip(self.node_array["id"].tolist(), self.node_array["layer"].tolist()))
+        enabled = self.connection_array[self.connection_array["enabled"]]
+        successors = {}
+        predecessors = {}
+        for from_id, to_id in zip(enabled["from_id"].tolist(), enabled["to_id"].tolist()):
+            if layers[to_id] != 0:  # Input values are set, never computed
+                successors.setdefault(from_id, []).append(to_id)
+                predecessors.setdefault(to_id, []).append(from_id)
+
+        def reachable(start, links):
+            seen = set(start)
+            stack = list(start)
+            while stack:
+                for next_id in links.get(stack.pop(), ()):
+                    if next_id not in seen:
+                        seen.add(next_id)
+                        stack.append(next_id)
+            return seen
+
+        fed = reachable([node_id for node_id, layer in layers.items() if layer == 0], successors)  # Reached from an input
+        used = reachable([node_id for node_id, layer in layers.items() if layer == 1], predecessors)  # Reaches an output
+        keep_nodes = [layer in (0, 1) or (node_id in fed and node_id in used) for node_id, layer in layers.items()]
+        keep_connections = [from_id in fed and to_id in used and layers[to_id] != 0
+                            for from_id, to_id in zip(enabled["from_id"].tolist(), enabled["to_id"].tolist())]
+
+        pruned = Genome(self.id)
+        pruned.node_array = self.node_array[np.array(keep_nodes, dtype=bool)]
+        pruned.connection_array = enabled[np.array(keep_connections, dtype=bool)]
+        pruned.fitness = self.fitness
+        return pruned
+
+    def compile(self):
+        """
+        Build a CompiledNetwork from the current nodes and enabled connections.
+        Nodes are sorted topologically (Kahn's algorithm) so hidden nodes are always
+        computed before the nodes they feed; nodes left over by a cycle are appended
+        in layer order and read 0.0 from sources that have not been computed yet.
+        :return: CompiledNetwork
+        """
+        ids = self.node_array["id"].tolist()
+        layers = self.node_array["layer"].tolist()
+        position = {node_id: i for i, node_id in enumerate(ids)}  # Node id -> row in the node array
+        incoming = [[] for _ in ids]  # Enabled (source row, weight) pairs per target row
+        outgoing = [[] for _ in ids]  # Target rows per source row
+        enabled = self.connection_array[self.connection_array["enabled"]]
+        for from_id, to_id, weight in zip(enabled["from_id"].tolist(), enabled["to_id"].tolist(), enabled["weight"].tolist()):
+            src = position[from_id]
+            dst = position[to_id]
+            if layers[dst] != 0:
+                incoming[dst].append((src, weight))
+                outgoing[src].append(dst)
+
+        # Kahn's algorithm, seeded with the input nodes so they take the first slots
+        pending = [len(edges) for edges in incoming]
+        inputs = [i for i, layer in enumerate(layers) if layer == 0]
+        order = inputs + [i for i, layer in enumerate(layers) if pending[i] == 0 and layer != 0]
+        for i in order:  # order grows while we iterate over it
+            for dst in outgoing[i]:
+                pending[dst] -= 1
+                if pending[dst] == 0:
+                    order.append(dst)
+        if len(order) < len(ids):
+            placed = set(order)
+            order.extend(sorted((i for i in range(len(ids)) if i not in placed), key=lambda i: layers[i]))
+
+        slot_of = {i: slot for slot, i in enumerate(order)}
+        edges = sorted((slot_of[dst], slot_of[src], weight)
+                       for dst in range(len(ids)) for src, weight in incoming[dst])
+        return CompiledNetwork(tuple(ids[i] for i in order),
+                               len(inputs),
+                               tuple(slot_of[i] for i, layer in enumerate(layers) if layer == 1),
+                               tuple(edge[0] for edge in edges),
+                               tuple(edge[1] for edge in edges),
+                               tuple(edge[2] for edge in edges))
 
     def propagate(self):
-        # Reset input sums for all nodes
-        for node in self.nodes:
-            node.input_sum = 0.0
-
-        # Sum inputs for each node
-        for connection in self.connections:
-            if connection.enabled:
-                connection.to_node.input_sum += connection.from_node.value * connection.weight
-
-        # Activate nodes (excluding input nodes)
-        for node in self.nodes:
-            if node.layer != 0:
-                node.activate()
+        # Evaluate in topological order and store the results back in the node array
+        network = self.compile()
+        values = self.node_array["value"]
+        slot_values = network.evaluate(values[self.node_array["layer"] == 0].tolist())
+        position = {node_id: i for i, node_id in enumerate(self.node_array["id"].tolist())}
+        values[[position[node_id] for node_id in network.node_ids]] = slot_values
 
     def get_outputs(self):
-        return [node.value for node in self.output_nodes]
-
-    def mutate_add_node(self):
-        if not self.connections:  # If there are no connections, return immediately
-            return
-        connection = random.choice(self.connections)  # Select a random connection
-        if not connection.enabled:  # If the connection is not enabled, return immediately
-            return
-        connection.enabled = False  # Disable the selected connection
-        new_node = self.add_node((connection.from_node.layer + connection.to_node.layer) / 2)  # Add a new node in between
-        self.add_connection(connection.from_node, new_node, 1.0)  # Add a connection from the original start node to the new node
-        self.add_connection(new_node, connection.to_node, connection.weight)  # Add a connection from the new node to the original end node
+        return self.node_array["value"][self.node_array["layer"] == 1].tolist()
 
-    def mutate_add_connection(self):
-        if len(self.nodes) < 2:  # If there are fewer than two nodes, return immediately
+    def mutate_add_node(self, rng=None):
+        rng = mutation.rng if rng is None else rng
+        if not len(self.connection_array):  # If there are no connections, return immediately
             return
-        from_node = random.choice(self.nodes)  # Select a random starting node
-        to_node = random.choice(self.nodes)  # Select a random ending node
-        if from_node.layer == to_node.layer:  # If the nodes are in the same layer, return immediately
+        index = rng.integers(len(self.connection_array))  # Select a random connection
+        connection = self.connection_array[index]
+        if not connection["enabled"]:  # If the connection is not enabled, return immediately
             return
-        if from_node.layer > to_node.layer:  # Ensure connections go forward in layers
-            from_node, to_node = to_node, from_node
-        weight = np.random.uniform(-1.0, 1.0)  # Assign a random weight to the connection
-        self.add_connection(from_node, to_node, weight)  # Add the new connection
-
-  #  HIEROOO    
- 
-    # def crossover(self, parent1, parent2, id1, id2):
-    #     newid = id1 + id2
-    #     child = Genome(newid)
-
-    #     # Inherit nodes from both parents
-    #     for node in parent1.nodes:
-    #         child.add_node(node.layer)
-    #     for node in parent2.nodes:
-    #         if not any(n.id == node.id for n in child.nodes):
-    #             child.add_node(node.layer)
-
-    #     # Create dictionaries of connections for easy lookup
-    #     parent1_innovations = {(conn.from_node.id, conn.to_node.id): conn for conn in parent1.connections}
-    #     parent2_innovations = {(conn.from_node.id, conn.to_node.id): conn for conn in parent2.connections}
-
-    #     all_innovations = set(parent1_innovations.keys()).union(parent2_innovations.keys())
-
-    #     for key in all_innovations:
-    #         if key in parent1_innovations and key in parent2_innovations:
-    #             if random.random() < 0.5:
-    #                 selected_conn = parent1_innovations[key]
-    #             else:
-    #                 selected_conn = parent2_innovations[key]
-    #         elif key in parent1_innovations:
-    #             selected_conn = parent1_innovations[key]
-    #         else:
-    #             selected_conn = parent2_innovations[key]
-
-    #         from_node_id, to_node_id = key
-    #         from_node = next(node for node in child.nodes if node.id == from_node_id)
-    #         to_node = next(node for node in child.nodes if node.id == to_node_id)
-    #         child.add_connection(from_node, to_node, selected_conn.weight)
-
-    #     return child
-
-    # def mutate(self):
-    #     mutation_rate = 0.2  # Example mutation rate, adjust as needed
-
-    #     # Mutate node values (optional, based on specific implementation needs)
-    #     for node in self.nodes:
-    #         if random.random() < mutation_rate:
-    #             node.value += np.random.uniform(-0.1, 0.1)  # Adjust mutation value range as needed
-
-    #     # Mutate connection weights
-    #     for conn in self.connections:
-    #         if random.random() < mutation_rate:
-    #             conn.weight += np.random.uniform(-0.1, 0.1)  # Adjust mutation value range as needed
-
-    #     # Occasionally add new nodes or connections
-    #     if random.random() < mutation_rate:
-    #         self.mutate_add_node()
-
-    #     if random.random() < mutation_rate:
-    #         self.mutate_add_connection()
-
-    def mutate(self):
-        if random.random() < self.node_add_prob:
-            self.mutate_add_node()
-        if random.random() < self.conn_add_prob:
-            self.mutate_add_connection()
-        for conn in self.connections:
-            if random.random() < self.weight_mutate_rate:
-                conn.weight += np.random.uniform(-self.weight_mutate_power, self.weight_mutate_power)
-                conn.weight = np.clip(conn.weight, -30, 30)    
-    # Additional functions for mutating nodes and connections
-    def mutate_add_node(self):
-        if not self.connections:
+        from_id, to_id, weight = int(connection["from_id"]), int(connection["to_id"]), float(connection["weight"])
+        self.connection_array["enabled"][index] = False  # Disable the selected connection
+        layers = self.node_array["layer"]
+        new_node = self.add_node((layers[self.node_index(from_id)] + layers[self.node_index(to_id)]) / 2,
+                                 innovations.split(from_id, to_id, self))  # Add a new node in between
+        self.add_connection_by_id(from_id, new_node.id, 1.0)  # Add a connection from the original start node to the new node
+        self.add_connection_by_id(new_node.id, to_id, weight)  # Add a connection from the new node to the original end node
+
+    def mutate_add_connection(self, rng=None, attempts=20):
+        rng = mutation.rng if rng is None else rng
+        if len(self.node_array) < 2:  # If there are fewer than two nodes, return immediately
             return
-        connection = random.choice(self.connections)
-        if not connection.enabled:
+        ids = self.node_array["id"]
+        layers = self.node_array["layer"]
+        edges = self.edges
+        for _ in range(attempts):  # Retry until a new edge that keeps the network acyclic is found
+            from_index = rng.integers(len(self.node_array))  # Select a random starting node
+            to_index = rng.integers(len(self.node_array))  # Select a random ending node
+            if layers[from_index] == layers[to_index]:  # Nodes in the same layer can not be connected
+                continue
+            if layers[from_index] > layers[to_index]:  # Ensure connections go forward in layers
+                from_index, to_index = to_index, from_index
+            from_id, to_id = int(ids[from_index]), int(ids[to_index])
+            if edges.has_edge(from_id, to_id) or edges.would_create_cycle(from_id, to_id):
+                continue
+            weight = rng.uniform(-1.0, 1.0)  # Assign a random weight to the connection
+            self.add_connection_by_id(from_id, to_id, weight)  # Add the new connection
             return
-        connection.enabled = False
-        new_node = self.add_node((connection.from_node.layer + connection.to_node.layer) / 2)
-        self.add_connection(connection.from_node, new_node, 1.0)
-        self.add_connection(new_node, connection.to_node, connection.weight)
 
-def create_offspring(top_genomes):
+    def crossover(self, other, child_id):
+        """
+        Create a child from this genome and other. Connection genes are aligned by
+        innovation number in one merge pass over both sorted lists: matching genes
+        are inherited from a random parent, disjoint and excess genes from the
+        fitter parent, which also supplies the nodes.
+        :param other: the second parent Genome
+        :param child_id: id of the new Genome
+        :return: Genome
+        """
+        fitter, weaker = (self, other) if self.fitness >= other.fitness else (other, self)
+        fitter_genes = fitter.connection_array[np.argsort(fitter.connection_array["innovation"], kind="stable")]
+        weaker_genes = weaker.connection_array[np.argsort(weaker.connection_array["innovation"], kind="stable")]
+        fitter_innovations = fitter_genes["innovation"].tolist()
+        weaker_innovations = weaker_genes["innovation"].tolist()
+
+        take_fitter = []  # Rows of fitter_genes inherited by the child
+        take_weaker = []  # Rows of weaker_genes inherited by the child
+        j = 0
+        for i, innovation in enumerate(fitter_innovations):
+            while j < len(weaker_innovations) and weaker_innovations[j] < innovation:
+                j += 1  # Disjoint gene of the weaker parent, dropped
+            if j < len(weaker_innovations) and weaker_innovations[j] == innovation and random.random() < 0.5:
+                take_weaker.append(j)  # Matching gene, inherited from the weaker parent
+            else:
+                take_fitter.append(i)  # Matching gene from the fitter parent, or its disjoint/excess gene
+
+        genes = np.concatenate((fitter_genes[take_fitter], weaker_genes[take_weaker]))
+        child = Genome(child_id)
+        child.node_array = fitter.node_array.copy()
+        child.node_array["value"] = 0.0
+        child.connection_array = genes[np.argsort(genes["innovation"], kind="stable")]
+        return child
+
+    def mutate(self, engine=None):
+        # Structural and weight mutation with the rates of the engine's config
+        (mutation if engine is None else engine).mutate(self)
+
+def create_offspring(top_genomes, child_id=None):
     parent1, parent2 = top_genomes
-    id1, id2 = top_genomes[0].id, top_genomes[1].id
-    child = parent1.crossover(parent1, parent2, id1, id2)
+    if child_id is None:
+        child_id = parent1.id + parent2.id
+    child = parent1.crossover(parent2, child_id)
     child.mutate()
     return child
 
-def eval_genomes(genomes):
+class Species:
+    def __init__(self, key, representative, generation):
+        self.key = key                        # Unique identifier for the species
+        self.representative = representative  # Genome new members are compared against
+        self.members = []                     # Genomes of the current generation
+        self.last_improved = generation       # Generation in which best_fitness last went up
+        self.best_fitness = -math.inf         # Best member fitness seen so far
+
+class SpeciesSet:
+    """
+    NEAT speciation. Compatibility distances of the whole population against the
+    species representatives are computed as one array operation, and distances of
+    genome/representative pairs whose genes did not change are cached between
+    generations. Settings come from the speciation options of a Config.
+    """
+    def __init__(self, config, engine=None):
+        self.compatibility_threshold = config.compatibility_threshold
+        self.excess_coefficient = config.compatibility_excess_coefficient
+        self.disjoint_coefficient = config.compatibility_disjoint_coefficient
+        self.weight_coefficient = config.compatibility_weight_coefficient
+        self.small_genome = config.compatibility_small_genome  # Below this many genes the excess and disjoint counts are not normalized
+        self.max_stagnation = config.max_stagnation          # Generations without improvement before a species is dropped
+        self.species_elitism = config.species_elitism        # Number of best species protected from stagnation
+        self.elitism = config.elitism                        # Best members of every species copied unchanged
+        self.survival_threshold = config.survival_threshold  # Fraction of every species allowed to breed
+        self.engine = mutation if engine is None else engine
+        self.species = []
+        self.next_species_key = 1
+        self.next_genome_id = 0
+        self.distance_cache = {}  # (genome genes key, representative genes key) -> distance
+
+    @staticmethod
+    def genes_key(genome):
+        connections = genome.connection_array
+        return hash((connections["innovation"].tobytes(), connections["weight"].tobytes()))
+
+    @staticmethod
+    def gene_matrix(genomes, columns):
+        # Presence and weight of every innovation number (one column each) for every genome (one row each)
+        present = np.zeros((len(genomes), len(columns)), dtype=bool)
+        weights = np.zeros((len(genomes), len(columns)))
+        for row, genome in enumerate(genomes):
+            index = np.searchsorted(columns, genome.connection_array["innovation"])
+            present[row, index] = True
+            weights[row, index] = genome.connection_array["weight"]
+        return present, weights
+
+    def distances(self, genomes, representatives):
+        """
+        Compatibility distance of every genome to every representative
+        :param genomes: list of P Genome objects
+        :param representatives: list of S Genome objects
+        :return: (P, S) array
+        """
+        columns = np.unique(np.concatenate([g.connection_array["innovation"] for g in genomes + representatives]))
+        present_a, weights_a = self.gene_matrix(genomes, columns)
+        present_b, weights_b = self.gene_matrix(representatives, columns)
+        count_a = present_a.sum(axis=1)
+        count_b = present_b.sum(axis=1)
+
+        both = present_a[:, None, :] & present_b[None, :, :]
+        matching = both.sum(axis=2)
+        weight_difference = (np.abs(weights_a[:, None, :] - weights_b[None, :, :]) * both).sum(axis=2) / np.maximum(matching, 1)
+
+        # Genes beyond the other genome's highest innovation number are excess, the other mismatches disjoint
+        cumulative_a = np.concatenate((np.zeros((len(genomes), 1), dtype=int), np.cumsum(present_a, axis=1)), axis=1)
+        cumulative_b = np.concatenate((np.zeros((len(representatives), 1), dtype=int), np.cumsum(present_b, axis=1)), axis=1)
+        last_a = len(columns) - np.argmax(present_a[:, ::-1], axis=1)  # Columns up to and including the last gene
+        last_b = len(columns) - np.argmax(present_b[:, ::-1], axis=1)
+        last_a[count_a == 0] = 0
+        last_b[count_b == 0] = 0
+        excess = (count_a[:, None] - cumulative_a[:, last_b]) + (count_b[None, :] - cumulative_b[:, last_a].T)
+        disjoint = count_a[:, None] + count_b[None, :] - 2 * matching - excess
+
+        # Normalize by the larger genome, but not for small genomes (as in the original NEAT) where it would
+        # squeeze every mismatch into a fraction of a gene and keep the whole population in one species
+        size = np.maximum(count_a[:, None], count_b[None, :])
+        size = np.where(size < self.small_genome, 1, np.maximum(size, 1))
+        return (self.excess_coefficient * excess / size + self.disjoint_coefficient * disjoint / size
+                + self.weight_coefficient * weight_difference)
+
+    def cached_distances(self, genomes, representatives, cache):
+        # Distance matrix that only computes the rows with an uncached genome/representative pair
+        genome_keys = [self.genes_key(g) for g in genomes]
+        representative_keys = [self.genes_key(r) for r in representatives]
+        result = np.empty((len(genomes), len(representatives)))
+        missing = []
+        for row, key in enumerate(genome_keys):
+            cached = [cache.get((key, r), self.distance_cache.get((key, r))) for r in representative_keys]
+            if None in cached:
+                missing.append(row)
+            else:
+                result[row] = cached
+        if missing:
+            result[missing] = self.distances([genomes[row] for row in missing], representatives)
+        for row, key in enumerate(genome_keys):
+            for column, r in enumerate(representative_keys):
+                cache[(key, r)] = result[row, column]
+        return result
+
+    def speciate(self, genomes, generation):
+        """
+        Assign every genome to the closest compatible species, creating new species for the rest
+        :param genomes: list of Genome objects with their fitness set
+        :param generation: current generation number
+        :return: None
+        """
+        cache = {}  # Only pairs used this generation are kept for the next one
+        unassigned = list(range(len(genomes)))
+        for species in self.species:
+            species.members = []
+
+        if self.species:
+            distance = self.cached_distances(genomes, [s.representative for s in self.species], cache)
+            closest = np.argmin(distance, axis=1)
+            fits = distance[np.arange(len(genomes)), closest] < self.compatibility_threshold
+            for row in np.flatnonzero(fits):
+                self.species[closest[row]].members.append(genomes[row])
+            unassigned = np.flatnonzero(~fits).tolist()
+
+        # Remaining genomes found new species, each new representative is checked against the rest at once
+        while unassigned:
+            representative = genomes[unassigned[0]]
+            species = Species(self.next_species_key, representative, generation)
+            self.next_species_key += 1
+            self.species.append(species)
+            distance = self.cached_distances([genomes[row] for row in unassigned], [representative], cache)[:, 0]
+            distance[0] = 0.0
+            species.members = [genomes[row] for row, d in zip(unassigned, distance) if d < self.compatibility_threshold]
+            unassigned = [row for row, d in zip(unassigned, distance) if d >= self.compatibility_threshold]
+
+        self.species = [s for s in self.species if s.members]
+        for species in self.species:
+            # The member closest to the old representative represents the species next generation
+            distance = self.cached_distances(species.members, [species.representative], cache)[:, 0]
+            species.representative = species.members[int(np.argmin(distance))]
+            best = max(g.fitness for g in species.members)
+            if best > species.best_fitness:
+                species.best_fitness = best
+                species.last_improved = generation
+        self.distance_cache = cache
+
+    def reproduce(self, population_size, generation):
+        """
+        Breed the next generation with explicit fitness sharing between species
+        :param population_size: number of genomes to create
+        :param generation: current generation number
+        :return: list of Genome objects
+        """
+        # Drop stagnant species, but always keep the best species_elitism of them
+        ranked = sorted(self.species, key=lambda s: s.best_fitness, reverse=True)
+        self.species = [s for i, s in enumerate(ranked)
+                        if i < self.species_elitism or generation - s.last_improved <= self.max_stagnation]
+
+        # Offspring per species proportional to its shifted mean fitness
+        all_fitness = [g.fitness for s in self.species for g in s.members]
+        low = min(all_fitness)
+        span = max(max(all_fitness) - low, 1.0)
+        adjusted = np.array([(np.mean([g.fitness for g in s.members]) - low) / span for s in self.species]) + 1e-3
+        spawn = np.floor(adjusted / adjusted.sum() * population_size).astype(int)
+        spawn[np.argmax(adjusted)] += population_size - spawn.sum()
+
+        self.next_genome_id = max(self.next_genome_id, max(g.id for s in self.species for g in s.members) + 1)
+        new_population = []
+        children = []
+        for species, count in zip(self.species, spawn):
+            members = sorted(species.members, key=lambda g: g.fitness, reverse=True)
+            elites = members[:min(self.elitism, count)]
+            new_population.extend(elites)  # Elites survive unchanged, so their cached distances stay valid
+            parents = members[:max(2, int(math.ceil(self.survival_threshold * len(members))))]
+            for _ in range(count - len(elites)):
+                parent1, parent2 = random.choice(parents), random.choice(parents)
+                children.append(parent1.crossover(parent2, self.next_genome_id))
+                self.next_genome_id += 1
+        self.engine.mutate_population(children)  # All children's weights are mutated as one array
+        return new_population + children
+
+BATCH_MIN_POPULATION = 200  # From this many birds on, the batched NumPy networks beat generated code
+
+def top_k_settled(fitness, done, k, penalty=VecEnv.PIPE_PENALTY):
+    """
+    Checks whether the ranking of the k fittest genomes can no longer change. Birds still flying all have
+    the same fitness, gain more until they die and then lose at most one collision penalty, while the dead
+    keep theirs. So the ranking is only fixed once at most one bird is flying, that bird is more than the
+    penalty ahead of every dead bird, and the dead in the top k are strictly ordered.
+    :param fitness: array of fitness values so far
+    :param done: boolean array, True for the dead
+    :param k: size of the top set
+    :param penalty: most fitness a flying bird can still lose
+    :return: bool
+    """
+    flying = fitness[~done]
+    if len(flying) > 1:
+        return False  # Tied until all but one of them die
+    dead = np.sort(fitness[done])[::-1]
+    if len(flying) == 1:
+        if len(dead) and not flying[0] - penalty > dead[0]:
+            return False
+        dead = dead[:k - 1]  # The flying bird holds the first place
+    else:
+        dead = dead[:k]
+    return bool(np.all(dead[:-1] > dead[1:]))
+
+def run_episode(genomes, backend=None, headless=HEADLESS, course=None, max_frames=0,
+                fitness_threshold=float("inf"), settle_top_k=0, decision_interval=1):
     """
-    Runs the simulation of the current population of birds and sets their fitness based on the distance they reach in the game.
+    Runs the simulation of a group of birds and sets their fitness based on the distance they reach in the game.
+    A genome's fitness depends only on its own bird and the course, so a population can be split into shards.
+    :param genomes: list of Genome objects
+    :param backend: "batch" for one PopulationNetwork call per frame, "codegen" for one generated
+                    function per bird, None to pick by population size
+    :param headless: run as fast as possible without frame cap, event pumping or drawing
+    :param course: Course giving the pipe heights, a new random one when None
+    :param max_frames: end the episode after this many frames, 0 for no limit
+    :param fitness_threshold: end the episode once a genome reaches this fitness
+    :param settle_top_k: end the episode once the ranking of the k fittest genomes can no longer change, 0 to fly on
+    :param decision_interval: ask the networks every this many frames and repeat their last action in between;
+                              physics and collisions still run every frame
+    :return: number of frames flown
     """
     global WIN, gen  # Use the global variables WIN (game window) and gen (generation count)
-    win = WIN  # Assign the game window to the local variable win
-    gen += 1  # Increment the generation count
 
-    # Start by creating lists to hold the genome itself, the neural network associated with the genome,
-    # and the bird object that uses that network to play
-    nets = []  # List to store the neural networks
-    birds = []  # List to store the bird objects
-    ge = []  # List to store the genome objects
-    base = Base(FLOOR)  # Create a Base object for the game floor
-    pipes = [Pipe(700)]  # Create a list of pipes with the first pipe at position 700
-    score = 0  # Initialize the score to 0
-
-    for genome in genomes:
-        genome.fitness = 0  # Start with a fitness level of 0 for each genome
-        net = genome  # Using the custom Genome class directly as the neural network
-        nets.append(net)  # Add the neural network to the nets list
-        birds.append(Bird(230, 350))  # Create a Bird object and add it to the birds list
-        ge.append(genome)  # Add the genome to the ge list
+    # One environment row per genome; the networks of all living birds are packed together so one call decides every jump
+    env = VecEnv(len(genomes))
+    if course is None:
+        course = Course()
+    obs = env.reset(course.seed)
+
+    if backend is None:
+        backend = "batch" if len(genomes) >= BATCH_MIN_POPULATION else "codegen"
+    networks = [genome.prune().compile() for genome in genomes]
+    if backend == "batch":
+        nets = PopulationNetwork(networks)  # Row i belongs to env.active[i]
+    else:
+        nets = [network.function() for network in networks]  # Called as net(y, dtop, dbot)
+    active = env.active  # Rows whose networks are in nets
 
     clock = pygame.time.Clock()  # Create a Clock object to control the game's frame rate
-
     run = True  # Set the run flag to True to start the game loop
+    actions = np.zeros(len(genomes), dtype=bool)
+
+    while run and len(active) > 0:  # Run the game loop as long as run is True and there are birds alive
+        if not headless:
+            clock.tick(FPS)  # Limit the game to 30 frames per second
+            for event in pygame.event.get():  # Check for events in the game
+                if event.type == pygame.QUIT:  # If the quit event is triggered
+                    run = False  # Set run to False to stop the game loop
+                    pygame.quit()  # Quit the pygame library
+                    quit()  # Exit the program
+                    break  # Break out of the event loop
+
+        # Every bird sees its location and the distances to the top and bottom pipe; it jumps where the first output is greater than 0.5
+        if (env.frame - 1) % decision_interval == 0:
+            if backend == "batch":
+                actions[active] = nets.activate(obs[active])[:, 0] > 0.5
+            else:
+                actions[active] = [net(*o)[0] > 0.5 for net, o in zip(nets, obs[active].tolist())]
+
+        obs, rewards, done, info = env.step(actions)
+
+        alive = ~done[active]
+        if not alive.all():  # Drop the networks of the birds that died
+            if backend == "batch":
+                nets.keep(alive)
+            else:
+                nets = [net for net, keep in zip(nets, alive) if keep]
+            active = active[alive]
+
+        if not headless:
+            draw_window(WIN, env.birds, env.pipes, env.base, env.score, gen, env.pipe_ind)  # Draw the game window with the updated game state
+
+        # Stop early so a generation with a good genome cannot fly forever; survivors keep the fitness they have
+        if max_frames and env.frame >= max_frames:
+            break
+        if env.returns.max() >= fitness_threshold:
+            break
+        if settle_top_k and top_k_settled(env.returns, env.done, settle_top_k):
+            break
 
-    # Time tracking variables
-    start_time = pygame.time.get_ticks()
-    last_second_time = start_time
-
-    while run and len(birds) > 0:  # Run the game loop as long as run is True and there are birds alive
-        clock.tick(30)  # Limit the game to 30 frames per second
-        current_time = pygame.time.get_ticks()
-        elapsed_seconds = (current_time - start_time) / 1000.0  # Convert milliseconds to seconds
-
-        # Add 1 point to score every second
-        if current_time - last_second_time >= 1000:
-            score += 1
-            last_second_time = current_time
-
-        for event in pygame.event.get():  # Check for events in the game
-            if event.type == pygame.QUIT:  # If the quit event is triggered
-                run = False  # Set run to False to stop the game loop
-                pygame.quit()  # Quit the pygame library
-                quit()  # Exit the program
-                break  # Break out of the event loop
-
-        pipe_ind = 0  # Initialize the pipe index to 0
-        if len(birds) > 0:  # If there are birds still alive
-            if len(pipes) > 1 and birds[0].x > pipes[0].x + pipes[0].PIPE_TOP.get_width():
-                # If there is more than one pipe and the first bird has passed the first pipe
-                pipe_ind = 1  # Set the pipe index to 1 to use the second pipe for neural network input
-
-        for x, bird in enumerate(birds):  # For each bird in the birds list
-            ge[x].fitness += 0.1  # Increase the bird's fitness by 0.1 for each frame it stays alive
-            bird.move()  # Move the bird
-
-            # Send bird location, top pipe location, and bottom pipe location to the neural network
-            net = nets[birds.index(bird)]  # Get the neural network for the current bird
-            inputs = (bird.y, abs(bird.y - pipes[pipe_ind].height), abs(bird.y - pipes[pipe_ind].bottom))
-            # Create the input tuple for the neural network
-            net.set_inputs(inputs)  # Set the inputs for the neural network
-            net.propagate()  # Propagate the inputs through the neural network
-            output = net.get_outputs()  # Get the outputs from the neural network
-
-            if output[0] > 0.5:  # If the output value is greater than 0.5
-                bird.jump()  # Make the bird jump
-
-        base.move()  # Move the base
-
-        rem = []  # List to store pipes that need to be removed
-        add_pipe = False  # Flag to check if a new pipe needs to be added
-        for pipe in pipes:  # For each pipe in the pipes list
-            pipe.move()  # Move the pipe
-            for bird in birds:  # For each bird in the birds list
-                if pipe.collide(bird, win):  # Check for collision between the bird and the pipe
-                    ge[birds.index(bird)].fitness -= 1  # Decrease the bird's fitness if it collides with a pipe
-                    nets.pop(birds.index(bird))  # Remove the neural network for the collided bird
-                    ge.pop(birds.index(bird))  # Remove the genome for the collided bird
-                    birds.pop(birds.index(bird))  # Remove the collided bird
-
-            if pipe.x + pipe.PIPE_TOP.get_width() < 0:  # If the pipe is off the screen to the left
-                rem.append(pipe)  # Add the pipe to the rem list
-
-            if not pipe.passed and pipe.x < bird.x:  # If the bird has passed the pipe
-                pipe.passed = True  # Set the pipe's passed flag to True
-                add_pipe = True  # Set add_pipe to True to add a new pipe
-
-        if add_pipe:  # If a new pipe needs to be added
-            score += 1  # Increase the score
-            for genome in ge:  # For each genome still in the game
-                genome.fitness += 5  # Increase the fitness for passing a pipe
-            pipes.append(Pipe(WIN_WIDTH))  # Add a new pipe to the pipes list
-
-        for r in rem:  # For each pipe in the rem list
-            pipes.remove(r)  # Remove the pipe from the pipes list
-
-        for bird in birds:  # For each bird in the birds list
-            if bird.y + bird.img.get_height() - 10 >= FLOOR or bird.y < -50:
-                # If the bird hits the floor or goes too high
-                nets.pop(birds.index(bird))  # Remove the neural network for the bird
-                #ge.pop(birds.index(bird))  # Remove the genome for the bird
-                birds.pop(birds.index(bird))  # Remove the bird from the birds list
-
-        draw_window(WIN, birds, pipes, base, score, gen, pipe_ind)  # Draw the game window with the updated game state
-
-    # Track the top two genomes by fitness score after the game loop
-    if ge:  # Ensure ge is not empty
-        top_two_genomes = sorted(ge, key=lambda g: g.fitness, reverse=True)[:2]
-        avg_fitness = sum(genome.fitness for genome in ge) / len(ge)
-        print(f"Generation {gen}: Avg Fitness = {avg_fitness:.2f}, Top Fitness = {top_two_genomes[0].fitness:.2f}")
+    for genome, fitness in zip(genomes, env.returns.tolist()):
+        genome.fitness = fitness
+    return env.frame
 
-        for i, genome in enumerate(top_two_genomes):
-            print(f"Top {i+1} Genome: Fitness {genome.fitness} Genome: ID = {genome.id}")
-            print(f'''
-            {genome.input_nodes[0].value} 0 
-                
-                                                0 {genome.output_nodes[0].value}
+def evaluate_shard(genomes, seed, backend=None, max_frames=0, decision_interval=1):
+    """
+    Worker side of ParallelEvaluator: fly one shard of the population headless on the seeded course.
+    :param genomes: list of Genome objects
+    :param seed: course seed, the same for every shard of a generation
+    :param backend: network backend, see run_episode
+    :param max_frames: end the episode after this many frames, 0 for no limit
+    :param decision_interval: ask the networks every this many frames, see run_episode
+    :return: list of fitness values in the order of genomes
+    """
+    run_episode(genomes, backend, headless=True, course=Course(seed), max_frames=max_frames,
+                decision_interval=decision_interval)
+    return [genome.fitness for genome in genomes]
 
-            {genome.input_nodes[1].value} 0     
+class ParallelEvaluator:
+    """
+    Evaluates a population in a pool of worker processes, one shard of genomes per worker.
+    Every shard flies the same seeded course to the same frame limit, so the fitness values equal those
+    of a single run_episode with the same max_frames and decision_interval. The fitness_threshold and
+    settle_top_k rules stop an episode on the state of the whole population and are not accepted here,
+    since a shard only sees its own birds.
+    """
+    def __init__(self, workers=None, backend=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.backend = backend
+        self.pool = None
+
+    def evaluate(self, genomes, seed, max_frames=0, decision_interval=1):
+        """
+        Sets the fitness of every genome.
+        :param genomes: list of Genome objects
+        :param seed: course seed
+        :param max_frames: end the episode after this many frames, 0 for no limit
+        :param decision_interval: ask the networks every this many frames, see run_episode
+        """
+        if not genomes:
+            return  # Nothing to shard, and no reason to start the pool
+        if self.pool is None:
+            # Spawned workers import flappygame before any pool initializer runs, so the flag has to be in the
+            # environment they start with; it is restored once they are up so this process is left as it was
+            previous = os.environ.get("FLAPPY_HEADLESS")
+            os.environ["FLAPPY_HEADLESS"] = "1"
+            try:
+                self.pool = multiprocessing.Pool(self.workers)
+            finally:
+                if previous is None:
+                    del os.environ["FLAPPY_HEADLESS"]
+                else:
+                    os.environ["FLAPPY_HEADLESS"] = previous
+        size = -(-len(genomes) // self.workers)  # Contiguous shards, at most one per worker
+        shards = [genomes[i:i + size] for i in range(0, len(genomes), size)]
+        results = self.pool.starmap(evaluate_shard, [(shard, seed, self.backend, max_frames, decision_interval)
+                                                     for shard in shards])
+        for shard, fitnesses in zip(shards, results):
+            for genome, fitness in zip(shard, fitnesses):
+                genome.fitness = fitness
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+def eval_genomes(genomes, backend=None, headless=HEADLESS, course=None, evaluator=None):
+    """
+    Evaluates the current population of birds, prints the generation's statistics and returns its best two genomes.
+    :param genomes: list of Genome objects
+    :param backend: network backend, see run_episode
+    :param headless: run as fast as possible without frame cap, event pumping or drawing
+    :param course: Course giving the pipe heights, a new random one when None
+    :param evaluator: ParallelEvaluator to fly the population in worker processes, None to fly it here;
+                      its episodes stop at max_frames only, as settle_top_k and fitness_threshold need every bird
+    :return: list of the top two Genome objects
+    """
+    global gen
+    gen += 1  # Increment the generation count
+    if course is None:
+        course = Course()
+    if evaluator is None:
+        run_episode(genomes, backend, headless, course, max_frames=config.max_frames,
+                    fitness_threshold=config.fitness_threshold, settle_top_k=config.settle_top_k,
+                    decision_interval=config.decision_interval)
+    else:
+        evaluator.evaluate(genomes, course.seed, max_frames=config.max_frames,
+                           decision_interval=config.decision_interval)
 
-                                                0 {genome.output_nodes[1].value}
+    # Track the top two genomes by fitness score
+    if genomes:  # Ensure the population is not empty
+        top_two_genomes = sorted(genomes, key=lambda g: g.fitness, reverse=True)[:2]
+        avg_fitness = sum(genome.fitness for genome in genomes) / len(genomes)
+        print(f"Generation {gen}: Avg Fitness = {avg_fitness:.2f}, Top Fitness = {top_two_genomes[0].fitness:.2f}")
 
-            {genome.input_nodes[2].value} 0     
-                ''')
+        for i, genome in enumerate(top_two_genomes):
+            enabled = int(genome.connection_array["enabled"].sum())
+            print(f"Top {i+1} Genome: Fitness {genome.fitness} Genome: ID = {genome.id}")
+            print(f"    {len(genome.node_array)} nodes, {enabled} of {len(genome.connection_array)} connections enabled")
     else:
         print("no more genomes")
         top_two_genomes = []
@@ -384,10 +1166,13 @@ def draw_genome_pygame(genome, screen, width, height):
     pygame.display.flip()
 
 
-# Example usage after eval_genomes
-if __name__ == "__main__":
-    initial_population_size = 50
-    population = [Genome(_) for _ in range(initial_population_size)]
+def initial_population(size):
+    """
+    Creates the first generation: 3 inputs, 2 outputs, two starting connections and one mutation of each kind.
+    :param size: number of genomes
+    :return: list of Genome objects
+    """
+    population = [Genome(_) for _ in range(size)]
 
     for genome in population:
         for _ in range(3):
@@ -398,20 +1183,37 @@ if __name__ == "__main__":
         genome.add_connection(genome.nodes[1], genome.nodes[4], random.uniform(-1.0, 1.0))
         genome.mutate_add_node()
         genome.mutate_add_connection()
-
-    generation = 0
-    while True:
-        top_two_genomes = eval_genomes(population)
+    return population
 
 
-        #draw_genome(population[0])
-        if len(top_two_genomes) < 2:
-            break
-        new_population = [create_offspring(top_two_genomes) for _ in range(initial_population_size)]
-        generation += 1
-
-        # Adaptive mutation rate
-        for genome in new_population:
-            genome.mutate_rate = max(0.1, 0.5 - 0.01 * generation)  # Example adaptation
+# Example usage after eval_genomes
+if __name__ == "__main__":
+    config = Config("config.txt")
+    mutation = MutationEngine(config)
+    initial_population_size = config.pop_size
+    population = initial_population(initial_population_size)
 
-        population = new_population
+    species_set = SpeciesSet(config)
+    evaluator = ParallelEvaluator() if HEADLESS else None  # Use every core when nobody is watching
+    generation = 0
+    try:
+        while True:
+            top_two_genomes = eval_genomes(population, course=Course(generation), evaluator=evaluator)  # Seeded, so a run can be replayed
+
+
+            #draw_genome(population[0])
+            if len(top_two_genomes) < 2:
+                break
+            if top_two_genomes[0].fitness >= config.fitness_threshold:
+                print(f"Fitness threshold {config.fitness_threshold} reached")
+                break
+            species_set.speciate(population, generation)  # Breed within species instead of from the top two only
+            print(f"Species: {len(species_set.species)}")
+            innovations.new_generation()  # Mutations of the new generation get new innovation numbers
+            new_population = species_set.reproduce(initial_population_size, generation)
+            generation += 1
+
+            population = new_population
+    finally:
+        if evaluator is not None:
+            evaluator.close()